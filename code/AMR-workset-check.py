@@ -8,29 +8,343 @@ Its arguments are AMR workset filesnames or directories.
 Companion files (.info) are automatically checked.
 """
 
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
 import logging as log
 import os
 from pathlib import Path
 import re
 import sys
-from typing import Optional
+from typing import Optional, Tuple
+
+try:
+    import hyperscan  # optional, for faster checking of large info files
+except ImportError:
+    hyperscan = None
 
 log.basicConfig(level=log.INFO)
+min_files_for_parallel_check = 8
+
+# Shared by workset and info files. Sentence lines are matched as bytes, as files are read in binary mode.
+# The sentence proper is line[m.end():].rstrip() rather than a lazy (.*?)\s*$ group, which would backtrack.
+_SNT_ID_RE = re.compile(rb'(([a-z][-_a-z0-9]*[a-z0-9]_\d{4})\.(\d+))\s*', re.IGNORECASE)
+_FIRST_TOKEN_RE = re.compile(rb'\S+')
+_WORKSET_ID_RE = re.compile(r'dip[-_a-zA-Z0-9]+[a-zA-Z0-9]', re.IGNORECASE)
+_USERNAME_RE = re.compile(r'[a-z]{3,}$')
+_WEEKDAYS = frozenset('Mon Tue Wed Thu Fri Sat Sun'.split())
+_MONTHS = frozenset('Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec'.split())
+_WORD_RE = re.compile(r'\w*')
+# a slot starts with '::' at the beginning of a line or after whitespace, as in daide.py
+_DOUBLE_COLON_SLOT_RE = re.compile(r'(?:^|\s+)::(?=\S)')
+# Info tags in the order sender, recipient, time, as an alternative to has_valid_country_tag and has_valid_time_tag
+_INFO_TAG_PATTERNS = (rb'\bsender: (austria|england|france|germany|italy|russia|turkey)\b',
+                      rb'\brecipient: (austria|england|france|germany|italy|russia|turkey)\b',
+                      rb'\btime: (spring|summer|fall|winter) 19\d\d\b')
+_COUNTRIES = frozenset({'austria', 'england', 'france', 'germany', 'italy', 'russia', 'turkey'})
+_SEASONS = frozenset({'spring', 'summer', 'fall', 'winter'})
+
+
+def parse_double_colon_slots(line: str) -> dict[str, str]:
+    """Get all slot values from a line such as '# ::id dip24 ::username ulf ::date Thu Mar 3, 2022' in one pass.
+    A value can be an empty string. If a slot occurs more than once, the last value wins."""
+    slots = {}
+    for field in _DOUBLE_COLON_SLOT_RE.split(line)[1:]:
+        slot_value = field.split(None, 1)
+        slots[slot_value[0]] = slot_value[1].strip() if len(slot_value) > 1 else ''
+    return slots
+
+
+def snt_id_match(line: bytes) -> Optional[re.Match]:
+    """Match a sentence line such as b'dip_0024.1 ...', using a cheap literal check on '_dddd.' to skip the regex
+    for lines that can't possibly start with a sentence ID."""
+    i = line.find(b'.')
+    if i < 7 or line[i-5:i-4] != b'_' or not line[i-4:i].isdigit() or not line[:1].isalpha():
+        return None
+    return _SNT_ID_RE.match(line)
+
+
+def is_valid_date(date: str) -> bool:
+    """Checks dates such as 'Thu Mar 3, 2022' (weekday optional)"""
+    parts = date.split(' ')
+    if len(parts) == 4:
+        if parts[0] not in _WEEKDAYS:
+            return False
+        parts = parts[1:]
+    if len(parts) != 3:
+        return False
+    month, day, year = parts
+    return (month in _MONTHS
+            and 2 <= len(day) <= 3 and day.endswith(',') and day[:-1].isdecimal()
+            and len(year) == 4 and year.startswith('20') and year.isdecimal())
+
+
+def is_word_char(c: str) -> bool:
+    return c.isalnum() or c == '_'
+
+
+def word_at(s: str, start: int) -> str:
+    """Returns the maximal run of word characters starting at start (scanned in C by the regex engine)"""
+    return _WORD_RE.match(s, start).group()
+
 
+def tag_value_starts(s: str, tag: str):
+    """Yields the position right after each occurrence of tag (e.g. 'sender: ') that starts at a word boundary"""
+    i = s.find(tag)
+    while i >= 0:
+        if i == 0 or not is_word_char(s[i-1]):
+            yield i + len(tag)
+        i = s.find(tag, i + 1)
 
-def slot_value_in_double_colon_del_list(line: str, slot: str, default: Optional = None) -> str:
-    m = re.match(fr'(?:.*\s)?::{slot}(|\s+\S.*?)(?:\s+::\S.*|\s*)$', line)
-    return m.group(1).strip() if m else default
+
+def has_valid_country_tag(content_lower: str, tag: str) -> bool:
+    return any(word_at(content_lower, start) in _COUNTRIES for start in tag_value_starts(content_lower, tag))
+
+
+def has_valid_time_tag(content_lower: str) -> bool:
+    """Checks for a tag such as 'time: spring 1901'"""
+    for start in tag_value_starts(content_lower, 'time: '):
+        season = word_at(content_lower, start)
+        space_index = start + len(season)
+        if season in _SEASONS and content_lower[space_index:space_index+1] == ' ':
+            year = word_at(content_lower, space_index + 1)
+            if len(year) == 4 and year.startswith('19') and year.isdecimal():
+                return True
+    return False
+
+
+def compile_info_tag_database():
+    if hyperscan is None:
+        return None
+    db = hyperscan.Database()
+    db.compile(expressions=list(_INFO_TAG_PATTERNS), ids=list(range(len(_INFO_TAG_PATTERNS))),
+               elements=len(_INFO_TAG_PATTERNS), flags=[hyperscan.HS_FLAG_CASELESS] * len(_INFO_TAG_PATTERNS))
+    return db
+
+
+_INFO_TAG_DB = compile_info_tag_database()
+
+
+def info_tag_line_indexes(data: bytes, lines: list[bytes]) -> list[set[int]]:
+    """Uses hyperscan to find sender, recipient and time tags of a whole (ASCII) info file in a single scan.
+    Returns, for each tag, the set of (0-based) indexes of lines with a valid tag."""
+    line_ends = list(accumulate(map(len, lines)))
+    tag_line_indexes = [set() for _ in _INFO_TAG_PATTERNS]
+
+    def on_match(tag_id: int, _from: int, to: int, _flags: int, _context) -> None:
+        tag_line_indexes[tag_id].add(bisect_right(line_ends, to - 1))
+
+    _INFO_TAG_DB.scan(data, match_event_handler=on_match)
+    return tag_line_indexes
 
 
 def usage():
     return f'Usage: {sys.argv[0]} [-h|--help] [filename(s)] [directory(s)]'
 
 
+class MessageLog:
+    """Collects log messages (e.g. in a worker process) to be emitted later in the main process, in file order"""
+    def __init__(self):
+        self.records: list[Tuple[int, str, tuple]] = []
+
+    def error(self, msg: str, *args) -> None:
+        self.records.append((log.ERROR, msg, args))
+
+    def warning(self, msg: str, *args) -> None:
+        self.records.append((log.WARNING, msg, args))
+
+    @staticmethod
+    def is_enabled_for(level: int) -> bool:
+        return log.getLogger().isEnabledFor(level)
+
+    def emit(self) -> None:
+        for level, msg, args in self.records:
+            log.log(level, msg, *args)
+
+
+def map_files(check_function, filenames: list[str]) -> list:
+    """Applies check_function to all files, in parallel processes if there are enough files to be worth it."""
+    if len(filenames) < min_files_for_parallel_check:
+        return list(map(check_function, filenames))
+    with ProcessPoolExecutor() as pool:
+        return list(pool.map(check_function, filenames, chunksize=16))
+
+
+def check_workset_header_line1(line: str, workset_file: str, messages: MessageLog) -> Optional[str]:
+    """Checks header line 1 (::type ::id ::username ::date); returns the workset ID"""
+    line_number = 1
+    basename = os.path.basename(workset_file)
+    ext_workset_id = basename.removesuffix('.txt')
+    slots = parse_double_colon_slots(line)
+    file_type = slots.get('type')
+    if file_type:
+        if file_type != 'workset':
+            messages.error("%s line %d has bad type '%s'", workset_file, line_number, file_type)
+    else:
+        messages.error('%s line %d lacks ::type', workset_file, line_number)
+    workset_id = slots.get('id')
+    if workset_id:
+        if workset_id != ext_workset_id:
+            messages.error('%s line %d ::id %s does not match filename %s',
+                           workset_file, line_number, workset_id, basename)
+        if not _WORKSET_ID_RE.match(workset_id):
+            messages.error('%s line %d has invalid ::id %s', workset_file, line_number, workset_id)
+    else:
+        messages.error('%s line %d lacks ::id', workset_file, line_number)
+    username = slots.get('username')
+    if username:
+        if not _USERNAME_RE.match(username):
+            messages.error("%s line %d has invalid ::username '%s'", workset_file, line_number, username)
+    else:
+        messages.error('%s line %d lacks ::username', workset_file, line_number)
+    date = slots.get('date')
+    if date:
+        if not is_valid_date(date):
+            messages.error("%s line %d has invalid ::date '%s'", workset_file, line_number, date)
+    else:
+        messages.error('%s line %d lacks ::date', workset_file, line_number)
+    if not line.startswith('# '):
+        messages.error("%s line %d should start with '# '", workset_file, line_number)
+    return workset_id
+
+
+def check_workset_header_line2(line: str, workset_file: str, messages: MessageLog) -> None:
+    line_number = 2
+    description = parse_double_colon_slots(line).get('description')
+    if description:
+        if len(description) < 20:
+            messages.warning("%s line %d has short ::description '%s'", workset_file, line_number, description)
+    else:
+        messages.error('%s line %d lacks ::description', workset_file, line_number)
+    if not line.startswith('# '):
+        messages.error("%s line %d should start with '# '", workset_file, line_number)
+
+
+def read_lines(filename: str) -> list[bytes]:
+    """Reads a file in one go and splits it into lines (keeping line ends) at the C level.
+    Like text mode reading, bytes.splitlines breaks lines at LF, CRLF and CR."""
+    with open(filename, 'rb') as f:
+        return f.read().splitlines(keepends=True)
+
+
+def report_duplicate_snt_ids(lines: list[bytes], first_line_number: int, filename: str,
+                             messages: MessageLog) -> None:
+    """Second pass over lines, only needed in the rare case that a file has duplicate sentence IDs"""
+    seen_snt_ids = set()
+    line_prefix = f'{filename} line '
+    for line_number, line in enumerate(lines, start=first_line_number):
+        if m := snt_id_match(line):
+            snt_id = m.group(1).decode('ascii')
+            if snt_id in seen_snt_ids:
+                messages.error('%s%d has duplicate sentence ID %s', line_prefix, line_number, snt_id)
+            else:
+                seen_snt_ids.add(snt_id)
+
+
+def check_workset_file(workset_file: str) -> Tuple[Optional[str], set[str], MessageLog]:
+    """Checks header and sentence lines of a workset file; returns its workset ID, sentence IDs and messages.
+    Doesn't log directly, so that it can run in a worker process."""
+    messages = MessageLog()
+    workset_id = None
+    snt_ids = []
+    snt_id_core = None
+    snt_id_sub_index = None
+    lines = read_lines(workset_file)
+    if len(lines) >= 1:
+        line = lines[0].decode('utf-8', errors='replace')
+        if not lines[0].endswith((b'\n', b'\r')):
+            messages.error("%s line 1 does not end with newline character ('%s')", workset_file, line)
+        workset_id = check_workset_header_line1(line, workset_file, messages)
+    if len(lines) >= 2:
+        line = lines[1].decode('utf-8', errors='replace')
+        if not lines[1].endswith((b'\n', b'\r')):
+            messages.error("%s line 2 does not end with newline character ('%s')", workset_file, line)
+        check_workset_header_line2(line, workset_file, messages)
+    line_prefix = f'{workset_file} line '
+    for line_number, line in enumerate(lines[2:], start=3):
+        if m4 := snt_id_match(line):
+            snt_id = m4.group(1).decode('ascii')
+            snt_ids.append(snt_id)
+            sub_index_s = m4.group(3)
+            sub_index = int(sub_index_s)
+            if sub_index == 0:
+                messages.error('%s%d sentence ID sub-index is 0 (%s)', line_prefix, line_number, snt_id)
+            elif sub_index_s[0] == 0x30:  # leading '0'
+                messages.error('%s%d sentence ID sub-index starts with 0 (%s)', line_prefix, line_number, snt_id)
+            if snt_id_core and not snt_id_core == m4.group(2):
+                messages.warning('%s%d change of code sentence ID from %s to %s',
+                                 line_prefix, line_number, snt_id_core.decode(), m4.group(2).decode())
+            elif snt_id_sub_index is not None and snt_id_sub_index + 1 != sub_index:
+                messages.warning('%s%d non-sequitive sentence ID sub-index %d to %d',
+                                 line_prefix, line_number, snt_id_sub_index, sub_index)
+            snt_id_core = m4.group(2)
+            snt_id_sub_index = sub_index
+            # decoded, as bytes.strip() only knows ASCII whitespace (not e.g. a no-break space)
+            if not line[m4.end():].decode('utf-8', errors='replace').strip():
+                messages.error('%s%d sentence ID %s has empty sentence', line_prefix, line_number, snt_id)
+        elif messages.is_enabled_for(log.ERROR):
+            # the first-token match is only needed for the error message
+            if m := _FIRST_TOKEN_RE.match(line):
+                first_token = m.group(0).decode('utf-8', errors='replace')
+                messages.error('%s%d does not start with a valid sentence ID: %s',
+                               line_prefix, line_number, first_token)
+            else:
+                messages.error('%s%d does not start with a valid sentence ID; rather, it starts with a space',
+                               line_prefix, line_number)
+    # only the last line can lack a newline character
+    if len(lines) >= 3 and not lines[-1].endswith((b'\n', b'\r')):
+        messages.error("%s%d does not end with newline character ('%s')",
+                       line_prefix, len(lines), lines[-1].decode('utf-8', errors='replace'))
+    # duplicates are rare, so build the set once (in C) rather than testing membership line by line
+    sentence_ids = set(snt_ids)
+    if len(sentence_ids) < len(snt_ids):
+        report_duplicate_snt_ids(lines[2:], 3, workset_file, messages)
+    if not sentence_ids:
+        messages.warning('%s contains no sentences', workset_file)
+    return workset_id, sentence_ids, messages
+
+
+def check_info_file(info_file: str) -> Tuple[set[str], MessageLog]:
+    """Checks sentence lines of an info file; returns its sentence IDs and messages."""
+    messages = MessageLog()
+    snt_ids = []
+    with open(info_file, 'rb') as f:
+        data = f.read()
+    lines = data.splitlines(keepends=True)
+    # hyperscan's caseless matching and \b are ASCII-only, so other files are checked line by line
+    tag_line_indexes = info_tag_line_indexes(data, lines) if _INFO_TAG_DB and data.isascii() else None
+    line_prefix = f'{info_file} line '
+    for line_number, line in enumerate(lines, start=1):
+        if m4 := snt_id_match(line):
+            snt_ids.append(m4.group(1).decode('ascii'))
+            if tag_line_indexes:
+                has_sender, has_recipient, has_time \
+                    = (line_number - 1 in line_indexes for line_indexes in tag_line_indexes)
+            else:
+                content_lower = line[m4.end():].rstrip().decode('utf-8', errors='replace').lower()
+                has_sender = has_valid_country_tag(content_lower, 'sender: ')
+                has_recipient = has_valid_country_tag(content_lower, 'recipient: ')
+                has_time = has_valid_time_tag(content_lower)
+            if not has_sender:
+                messages.error('%s%d lacks valid sender', line_prefix, line_number)
+            if not has_recipient:
+                messages.error('%s%d lacks valid recipient', line_prefix, line_number)
+            if not has_time:
+                messages.error('%s%d lacks valid time', line_prefix, line_number)
+    if lines and not lines[-1].endswith((b'\n', b'\r')):
+        messages.error("%s%d does not end with newline character ('%s')",
+                       line_prefix, len(lines), lines[-1].decode('utf-8', errors='replace'))
+    sentence_ids = set(snt_ids)
+    if len(sentence_ids) < len(snt_ids):
+        report_duplicate_snt_ids(lines, 1, info_file, messages)
+    return sentence_ids, messages
+
+
 def main():
     dirs = []
-    workset_files = []
-    info_files = []
+    # file path -> workset ID derived from filename (e.g. 'dip24' for 'workset/examples/dip24.txt')
+    ext_workset_id_by_workset_path: dict[str, str] = {}
+    ext_workset_id_by_info_path: dict[str, str] = {}
     help_printed = False
     if len(sys.argv) <= 1:
         print(usage())
@@ -41,182 +355,77 @@ def main():
             if path.is_dir():
                 dirs.append(path)
             elif path.is_file() and arg.endswith('.txt'):
-                if not path in workset_files:
-                    workset_files.append(path)
-                info_file = re.sub('\.txt$', '.info', arg)
+                ext_workset_id = path.name[:-4]
+                ext_workset_id_by_workset_path[os.fspath(path)] = ext_workset_id
+                info_file = arg[:-4] + '.info'
                 info_path = Path(info_file)
                 if info_path.is_file():
-                    if not info_path in info_files:
-                        info_files.append(info_path)
+                    ext_workset_id_by_info_path[os.fspath(info_path)] = ext_workset_id
             elif path.is_file() and arg.endswith('.info'):
-                if not path in info_files:
-                    info_files.append(path)
+                ext_workset_id_by_info_path[os.fspath(path)] = path.name[:-5]
             elif arg in ('-h', '--help'):
                 print(usage())
                 help_printed = True
             else:
-                log.info(f'Ignoring unrecognized arg {arg}')
+                log.info('Ignoring unrecognized arg %s', arg)
     for directory in dirs:
-        for filename in os.listdir(directory):
-            path = Path(os.path.join(directory, filename))
-            if path.is_file():
-                if filename.endswith('.txt'):
-                    if not path in workset_files:
-                        workset_files.append(path)
-                elif filename.endswith('.info'):
-                    if not path in info_files:
-                        info_files.append(path)
-    # print('Worksets', workset_files)
-    # print('Info', info_files)
-    ht = {}
+        # os.scandir entries cache the file type from the directory read, so no extra stat() per file
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    # normalized like the paths of file args (e.g. no leading './'), so that duplicates share a key
+                    if entry.name.endswith('.txt'):
+                        ext_workset_id_by_workset_path[os.fspath(Path(entry.path))] = entry.name[:-4]
+                    elif entry.name.endswith('.info'):
+                        ext_workset_id_by_info_path[os.fspath(Path(entry.path))] = entry.name[:-5]
+    # print('Worksets', ext_workset_id_by_workset_path)
+    # print('Info', ext_workset_id_by_info_path)
+    workset_snt_ids_by_id: dict[str, set[str]] = {}
+    info_snt_ids_by_id: dict[str, set[str]] = {}
     n_of_worksets_checked = 0
     workset_ids = set()
-    for workset_file in sorted(workset_files):
-        basename = os.path.basename(workset_file)
-        ext_workset_id = basename.removesuffix('.txt')
-        with open(workset_file) as f:
-            line_number = 0
-            sentence_ids = set()
-            n_sentences = 0
-            snt_id_core = None
-            snt_id_sub_index = None
-            for line in f:
-                line_number += 1
-                if not line.endswith('\n'):
-                    log.error(f"{workset_file} line {line_number} does not end with newline character ('{line}')")
-                if line_number == 1:
-                    file_type = slot_value_in_double_colon_del_list(line, 'type')
-                    if file_type:
-                        if file_type != 'workset':
-                            log.error(f"{workset_file} line {line_number} has bad type '{file_type}'")
-                    else:
-                        log.error(f'{workset_file} line {line_number} lacks ::type')
-                    workset_id = slot_value_in_double_colon_del_list(line, 'id')
-                    if workset_id:
-                        workset_ids.add(workset_id)
-                        if workset_id != ext_workset_id:
-                            log.error(f'{workset_file} line {line_number} ::id {workset_id} '
-                                      f'does not match filename {basename}')
-                        if not re.match(r'dip[-_a-zA-Z0-9]+[a-zA-Z0-9]', workset_id, re.IGNORECASE):
-                            log.error(f'{workset_file} line {line_number} has invalid ::id {workset_id}')
-                    else:
-                        log.error(f'{workset_file} line {line_number} lacks ::id')
-                    username = slot_value_in_double_colon_del_list(line, 'username')
-                    if username:
-                        if not re.match(r'[a-z]{3,}$', username):
-                            log.error(f"{workset_file} line {line_number} has invalid ::username '{username}'")
-                    else:
-                        log.error(f'{workset_file} line {line_number} lacks ::username')
-                    date = slot_value_in_double_colon_del_list(line, 'date')
-                    if date:
-                        if not re.match(r'(?:(Mon|Tue|Wed|Thu|Fri|Sat|Sun) )?'
-                                        r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) \d{1,2}, 20\d\d$', date):
-                            log.error(f"{workset_file} line {line_number} has invalid ::date '{date}'")
-                    else:
-                        log.error(f'{workset_file} line {line_number} lacks ::date')
-                    if not line.startswith('# '):
-                        log.error(f"{workset_file} line {line_number} should start with '# '")
-                elif line_number == 2:
-                    description = slot_value_in_double_colon_del_list(line, 'description')
-                    if description:
-                        if len(description) < 20:
-                            log.warning(f"{workset_file} line {line_number} has short ::description '{description}'")
-                    else:
-                        log.error(f'{workset_file} line {line_number} lacks ::description')
-                    if not line.startswith('# '):
-                        log.error(f"{workset_file} line {line_number} should start with '# '")
-                else:
-                    if m4 := re.match(r'(([a-z][-_a-z0-9]*[a-z0-9]_\d\d\d\d)\.(\d+))\s*(.*?)\s*$', line, re.IGNORECASE):
-                        n_sentences = +1
-                        snt_id = m4.group(1)
-                        if snt_id in sentence_ids:
-                            log.error(f'{workset_file} line {line_number} has duplicate sentence ID {snt_id}')
-                        else:
-                            sentence_ids.add(snt_id)
-                        if m4.group(3) == '0':
-                            log.error(f'{workset_file} line {line_number} sentence ID sub-index is 0 ({snt_id})')
-                        elif m4.group(3).startswith('0'):
-                            log.error(f'{workset_file} line {line_number} sentence ID sub-index '
-                                      f'starts with 0 ({snt_id})')
-                        if snt_id_core and not snt_id_core == m4.group(2):
-                            log.warning(f'{workset_file} line {line_number} change of code sentence ID '
-                                        f'from {snt_id_core} to {m4.group(2)}')
-                        elif snt_id_sub_index and (int(snt_id_sub_index) +1 != int(m4.group(3))):
-                            log.warning(f'{workset_file} line {line_number} non-sequitive sentence ID sub-index '
-                                        f'{snt_id_sub_index} to {m4.group(3)}')
-                        snt_id_core = m4.group(2)
-                        snt_id_sub_index = m4.group(3)
-                        if m4.group(4) == '':
-                            log.error(f'{workset_file} line {line_number} sentence ID {snt_id} has empty sentence')
-                    else:
-                        if m := re.match(r'\S+', line):
-                            first_token = m.group(0)
-                            log.error(f"{workset_file} line {line_number} does not start "
-                                      f"with a valid sentence ID: {first_token}")
-                        else:
-                            log.error(f"{workset_file} line {line_number} does not start with a valid sentence ID; "
-                                      f"rather, it starts with a space")
-            if n_sentences == 0:
-                log.warning(f"{workset_file} contains no sentences")
-            n_of_worksets_checked += 1
-            ht[('workset snt-IDs', ext_workset_id)] = sentence_ids
+    workset_files = sorted(ext_workset_id_by_workset_path)
+    for workset_file, (workset_id, sentence_ids, messages) \
+            in zip(workset_files, map_files(check_workset_file, workset_files)):
+        messages.emit()
+        if workset_id:
+            workset_ids.add(workset_id)
+        workset_snt_ids_by_id[ext_workset_id_by_workset_path[workset_file]] = sentence_ids
+        n_of_worksets_checked += 1
 
     n_of_info_files_checked = 0
     info_ids = set()
-    for info_file in sorted(info_files):
-        basename = os.path.basename(info_file)
-        ext_workset_id = basename.removesuffix('.info')
-        with open(info_file) as f:
-            line_number = 0
-            sentence_ids = set()
-            n_sentences = 0
-            info_ids.add(ext_workset_id)
-            for line in f:
-                line_number += 1
-                if not line.endswith('\n'):
-                    log.error(f"{info_file} line {line_number} does not end with newline character ('{line}')")
-                if m4 := re.match(r'(([a-z][-_a-z0-9]*[a-z0-9]_\d\d\d\d)\.(\d+))\s*(.*?)\s*$', line, re.IGNORECASE):
-                    n_sentences += 1
-                    snt_id = m4.group(1)
-                    if snt_id in sentence_ids:
-                        log.error(f'{info_file} line {line_number} has duplicate sentence ID {snt_id}')
-                    else:
-                        sentence_ids.add(snt_id)
-                    content = m4.group(4)
-                    if not re.search(r'\bsender: (Austria|England|France|Germany|Italy|Russia|Turkey)\b',
-                                     content, re.IGNORECASE):
-                        log.error(f'{info_file} line {line_number} lacks valid sender')
-                    if not re.search(r'\brecipient: (Austria|England|France|Germany|Italy|Russia|Turkey)\b',
-                                     content, re.IGNORECASE):
-                        log.error(f'{info_file} line {line_number} lacks valid recipient')
-                    if not re.search(r'\btime: (Spring|Summer|Fall|Winter) 19\d\d\b',
-                                     content, re.IGNORECASE):
-                        log.error(f'{info_file} line {line_number} lacks valid time')
-
-            n_of_info_files_checked += 1
-            ht[('info snt-IDs', ext_workset_id)] = sentence_ids
+    info_files = sorted(ext_workset_id_by_info_path)
+    for info_file, (sentence_ids, messages) in zip(info_files, map_files(check_info_file, info_files)):
+        messages.emit()
+        ext_workset_id = ext_workset_id_by_info_path[info_file]
+        info_ids.add(ext_workset_id)
+        info_snt_ids_by_id[ext_workset_id] = sentence_ids
+        n_of_info_files_checked += 1
     if workset_ids != info_ids:
         missing_info_ids = workset_ids - info_ids
         if missing_info_ids:
-            log.warning(f'Missing info files for worksets: {missing_info_ids}')
+            log.warning('Missing info files for worksets: %s', missing_info_ids)
         missing_workset_ids = info_ids - workset_ids
         if missing_workset_ids:
-            log.warning(f'Missing worksets for: {missing_workset_ids}')
+            log.warning('Missing worksets for: %s', missing_workset_ids)
     joint_workset_ids = workset_ids.intersection(info_ids)
     for workset_id in joint_workset_ids:
-        workset_snt_ids = ht.get(('workset snt-IDs', workset_id))
-        info_snt_ids = ht.get(('info snt-IDs', workset_id))
+        workset_snt_ids = workset_snt_ids_by_id.get(workset_id)
+        info_snt_ids = info_snt_ids_by_id.get(workset_id)
         if workset_snt_ids != info_snt_ids:
             missing_snt_ids_in_info = workset_snt_ids - info_snt_ids
             if missing_snt_ids_in_info:
-                log.error(f'{workset_id}.info does not cover snt IDs (compared to {workset_id}.txt): {sorted(list(missing_snt_ids_in_info))}')
+                log.error('%s.info does not cover snt IDs (compared to %s.txt): %s',
+                          workset_id, workset_id, sorted(list(missing_snt_ids_in_info)))
             missing_snt_ids_in_workset = info_snt_ids - workset_snt_ids
             if missing_snt_ids_in_workset:
-                log.error(f'{workset_id}.info contains spurious snt IDs (compared to {workset_id}.txt): {sorted(list(missing_snt_ids_in_workset))}')
+                log.error('%s.info contains spurious snt IDs (compared to %s.txt): %s',
+                          workset_id, workset_id, sorted(list(missing_snt_ids_in_workset)))
     if n_of_worksets_checked or not help_printed:
-        log.info(f"Number of worksets checked: {n_of_worksets_checked}")
+        log.info('Number of worksets checked: %d', n_of_worksets_checked)
     if n_of_info_files_checked or not help_printed:
-        log.info(f"Number of info files checked: {n_of_info_files_checked}")
+        log.info('Number of info files checked: %d', n_of_info_files_checked)
 
 
 if __name__ == "__main__":
@@ -6,23 +6,60 @@ Written by Ulf Hermjakob, USC/ISI
 
 import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from daide import Daide
+from itertools import chain, islice
 import json
 import os
 from pathlib import Path
 import re
 import regex
 import sys
-from typing import Optional, Tuple, Union
+from typing import Iterable, Iterator, Optional, Tuple, Union
 
 data_dir = Path(__file__).parent.parent / 'data'
 data_dir_path = str(data_dir.resolve())
 
+# AMR parsing (parse_amr, file_to_amrs)
+_COMMENT_LINE_RE = re.compile(r'\s*(#[^\n]*)\n')
+_AMR_LINES_RE = re.compile(r'(\(.*?\n(?:[ \t]+.*\S\s*?\n)*)')
+_NODE_OPEN_RE = re.compile(r'\s*\(([a-z]\d*)\s*/\s*([a-z][a-z0-9]*(?:-[a-z0-9]+)*)')
+_ROLE_RE = re.compile(r'\s*:([a-z][a-z0-9]*(?:-[a-z0-9]+)*)', re.IGNORECASE)
+# sub after a role, by group: 1 AMR (start only), 2 quoted string, 3 reentrancy variable, 4 non-quoted string
+_SUB_RE = re.compile(r'\s*(?:(?=(\())|"((?:\\"|[^"]+)*)"|([a-z]\d*)(?![a-z])|([^\s()]+))')
+_CLOSE_PAREN_RE = re.compile(r'\s*\)')
+_NON_SPACE_RE = re.compile(r'\s*\S')
+# DAIDE templates (match_for_daide, match_map, amr_to_daide)
+_TARGET_RE = re.compile(r'\((\S+)\s+(.*)\)$')
+_TYPED_TEMPLATE_VAR_RE = re.compile(r'\$([a-z][a-z0-9]*)\((.*)\)$')
+_TEMPLATE_VAR_RE = re.compile(r'\$([a-z][a-z0-9]*)$')
+_TARGET_ARG_VALUE_RE = regex.compile(r':([a-z][-a-z0-9]*)\s+([^\s()]+(?:\([^\s()]+\))?'
+                                     r'|(\((?:[^()]++|(?3))*\))(?:\([^\s()]+\))?)', regex.IGNORECASE)
+_TEMPLATE_VAR_IN_STRING_RE = re.compile(r'\$([a-z][a-z0-9]*)(?![a-z0-9])')
+_DOUBLE_PARENTHESES_RE = re.compile(r'\((\([^()]*\))\)')
+_SUP_MTO_PARENTHESES_RE = re.compile(r'( SUP )\((\([^()]+\))( MTO [A-Z]{3})\)')
+_SPECIFIC_UNIT_RE = re.compile(r'^\([A-Z]{3} (?:AMY|FLT) ')
+_SCD_ANCESTOR_CONCEPTS = frozenset({'propose-01', 'agree-01'})
+_PLAIN_LIST_PARENT_CONCEPTS = frozenset({'ally-01', 'demilitarize-01'})  # 'and' without AND under these concepts
+_NAMED_ENTITY_CONCEPTS = frozenset({'country', 'province', 'sea'})
+# interned :op1, :op2, ... roles; see op_role
+_OP_ROLES = tuple(sys.intern(f'op{i}') for i in range(64))
+# DAIDE output classification (main)
+_EXTENDED_AMR_CONCEPT_RE = re.compile(r'([a-z]\S*-\d\d\b)')
+_UNDERSPECIFIED_UNIT_RE = re.compile(r'\((?:army|fleet) :(?:mod|location) [A-Z]{3}\)')
+_LOWERCASE_RE = re.compile(r'[a-z]')
+_DAIDE_TOKEN_RE = re.compile(r'[A-Z]{3}')
+_slot_value_re_cache: dict[str, re.Pattern] = {}
+_daide_template_cache: dict[str, Optional['DaideTemplate']] = {}
+
 
 def slot_value_in_double_colon_del_list(line: str, slot: str, default: Optional = None) -> str:
     """For a given slot, e.g. 'cost', get its value from a line such as '::s1 of course ::s2 ::cost 0.3' -> 0.3
     The value can be an empty string, as for ::s2 in the example above."""
-    m = re.match(fr'(?:.*\s)?::{slot}(|\s+\S.*?)(?:\s+::\S.*|\s*)$', line)
+    if (slot_value_re := _slot_value_re_cache.get(slot)) is None:
+        slot_value_re = re.compile(fr'(?:.*\s)?::{slot}(|\s+\S.*?)(?:\s+::\S.*|\s*)$')
+        _slot_value_re_cache[slot] = slot_value_re
+    m = slot_value_re.match(line)
     return m.group(1).strip() if m else default
 
 
@@ -31,6 +68,9 @@ def has_matching_outer_parentheses(s: str) -> bool:
         return False
     elif not s.endswith(')'):
         return False
+    # fast path for the common case of no inner closing parenthesis, e.g. '(ENG FLT LON)'
+    elif ')' not in s[1:-1]:
+        return '(' not in s[1:-1]
     n_open_parentheses = 0
     for i, c in enumerate(s):
         if c == '(':
@@ -42,13 +82,98 @@ def has_matching_outer_parentheses(s: str) -> bool:
     return n_open_parentheses == 0
 
 
+def op_role(i: int) -> str:
+    return _OP_ROLES[i] if i < len(_OP_ROLES) else f'op{i}'
+
+
+def iter_amr_records(f: Iterable[str]) -> Iterator[str]:
+    """Reads the lines of an AMR file and yields records that can be parsed independently, split at blank lines
+    after an AMR with balanced parentheses. Comment lines without AMR stay with the next AMR."""
+    lines = []
+    has_amr = False
+    n_open_parentheses = 0
+    for line in f:
+        if has_amr and n_open_parentheses <= 0 and line.isspace():
+            yield ''.join(lines)
+            lines = []
+            has_amr = False
+            n_open_parentheses = 0
+        lines.append(line)
+        if not line.lstrip().startswith('#'):
+            if '(' in line:
+                has_amr = True
+            n_open_parentheses += line.count('(') - line.count(')')
+    if lines:
+        yield ''.join(lines)
+
+
 class AMRnode:
+    # many nodes per corpus, so no per-instance __dict__
+    __slots__ = ('concept', 'variable', 'parent', 'subs', 'subs_by_role', 'parents', '_daide', '_ne_name')
+
     def __init__(self, concept: str, parent=None, variable: Optional = None):
         self.concept = concept
         self.variable = variable
         self.parent = parent
         self.subs: list[Tuple[str, Union[AMRnode, str, None]]] = []  # role sub
+        self.subs_by_role: dict[str, list[Union[AMRnode, str, None]]] = {}  # role -> subs, in order of subs
         self.parents: list[AMRnode] = []
+        # cached results of AMR.amr_to_daide (when not at top level) and AMR.ne_amr_to_name
+        self._daide: Optional[Tuple[str, list[str]]] = None
+        self._ne_name: Optional[str] = None
+
+    def add_sub(self, role: str, sub: Union['AMRnode', str, None]) -> None:
+        self.subs.append((role, sub))
+        self.subs_by_role.setdefault(role, []).append(sub)
+
+    def replace_sub(self, index: int, sub: Union['AMRnode', str, None]) -> None:
+        role = self.subs[index][0]
+        role_index = sum(1 for role2, _ in self.subs[:index] if role2 == role)
+        self.subs[index] = (role, sub)
+        self.subs_by_role[role][role_index] = sub
+
+
+class DaideTemplateElement:
+    """Head or argument value of a DAIDE template: an AMR concept such as 'move-01',
+    a variable such as '$unit', optionally restricted to concepts as in '$utype(army|fleet)', or a sub-template"""
+    def __init__(self, concept: Optional[str] = None, var: Optional[str] = None,
+                 concepts: Optional[list[str]] = None, sub_template: Optional['DaideTemplate'] = None):
+        self.concept = concept
+        self.var = var
+        self.concepts = concepts
+        self.sub_template = sub_template
+
+
+class DaideTemplate:
+    """Preparsed DAIDE template such as '(move-01 :ARG1 $unit :ARG2 $destination)'"""
+    def __init__(self, head: DaideTemplateElement, args: list[Tuple[str, DaideTemplateElement]]):
+        self.head = head
+        self.args = args
+
+
+def parse_daide_template_element(s: str) -> DaideTemplateElement:
+    if m := (_TYPED_TEMPLATE_VAR_RE.match(s) or _TEMPLATE_VAR_RE.match(s)):
+        return DaideTemplateElement(var=m.group(1), concepts=m.group(2).split('|') if m.lastindex == 2 else None)
+    elif has_matching_outer_parentheses(s):
+        # an unparsable sub-template matches nothing
+        return DaideTemplateElement(sub_template=daide_template(s))
+    else:
+        return DaideTemplateElement(concept=s)
+
+
+def daide_template(target_s: str) -> Optional[DaideTemplate]:
+    """Parses a DAIDE template string once; later calls for the same string return the cached result."""
+    if target_s in _daide_template_cache:
+        return _daide_template_cache[target_s]
+    template = None
+    if m2 := _TARGET_RE.match(target_s):
+        head = parse_daide_template_element(m2.group(1))
+        if head.sub_template is None:
+            args = [(arg_value[0], parse_daide_template_element(arg_value[1]))
+                    for arg_value in _TARGET_ARG_VALUE_RE.findall(m2.group(2))]
+            template = DaideTemplate(head, args)
+    _daide_template_cache[target_s] = template
+    return template
 
 
 class AMR:
@@ -56,132 +181,176 @@ class AMR:
         self.root: Optional[AMRnode] = None
         self.variable_to_amr_node = {}
         self.orphan_variables = defaultdict(list)
-        self.previously_printed_variables = []
+        self.previously_printed_variables = set()
 
     def match_map(self, amr_node, d: dict, s: str):
-        while m3 := re.match(r'(.*?)\$([a-z][a-z0-9]*)(?![a-z0-9])(.*)$', s):
-            pre, var, post = m3.group(1, 2, 3)
+        # single left-to-right pass; the character before a variable is taken from the output built so far
+        parts = []
+        prev_char = ''
+        end = 0
+        for m3 in _TEMPLATE_VAR_IN_STRING_RE.finditer(s):
+            start = m3.start()
+            if start > end:
+                parts.append(s[end:start])
+                prev_char = s[start-1]
+            end = m3.end()
+            var = m3.group(1)
             value = d.get(var)
             if value is None:
                 value = '$' + var
             elif ' ' in value \
                     and (not (has_matching_outer_parentheses(value))) \
-                    and (not (pre.endswith('(') and post.startswith(')'))):
+                    and (not (prev_char == '(' and s.startswith(')', end))):
                 value = '(' + value + ')'
-            s = pre + value + post
+            parts.append(value)
+            if value:
+                prev_char = value[-1]
+        if parts:
+            parts.append(s[end:])
+            s = ''.join(parts)
         if self.sub_amr_node_by_role(amr_node, ['polarity']) == '-':
             s = f'NOT ({s})'
         if self.amr_has_unknown_sub(amr_node):
             d['warnings'] = self.extend_new_warnings(d.get('warnings', []), ['includes question'])
-        while m3 := re.match(r'(.*)\((\([^()]*\))\)(.*)$', s):
-            s = m3.group(1) + m3.group(2) + m3.group(3)
+        while True:
+            s2 = _DOUBLE_PARENTHESES_RE.sub(r'\1', s)
+            if s2 == s:
+                break
+            s = s2
         # simplify AUS SUP ((FRA AMY TYR) MTO VEN) -> AUS SUP (FRA AMY TYR) MTO VEN
-        s = re.sub(r'( SUP )\((\([^()]+\))( MTO [A-Z]{3})\)', r'\1\2\3', s)
+        s = _SUP_MTO_PARENTHESES_RE.sub(r'\1\2\3', s)
         return s, d.get('warnings', [])
 
     def string_to_amr(self, s: str, parent: Optional[AMRnode] = None, rec_level: int = 0) -> \
             Tuple[Optional[AMRnode], str, list[str], Optional[str], Optional[str], Optional[str]]:
         # AMR_Node built, rest, error message, sentence_id, sentence
+        amr_node, pos, errors, snt_id, snt, amr_s = self.parse_amr(s, 0, parent=parent, rec_level=rec_level)
+        return amr_node, s[pos:], errors, snt_id, snt, amr_s
+
+    def parse_amr(self, buf: str, pos: int, parent: Optional[AMRnode] = None, rec_level: int = 0) -> \
+            Tuple[Optional[AMRnode], int, list[str], Optional[str], Optional[str], Optional[str]]:
+        """Like string_to_amr, but parses buf from position pos onwards and returns the position after the AMR
+        instead of the rest of the string, so that buf is never copied."""
+        # AMR_Node built, end position, error message, sentence_id, sentence
         errors = []
         snt = None
         snt_id = None
         amr_s = None
-        while m2 := re.match(r'\s*(#[^\n]*)\n(.*)', s, re.DOTALL):
+        while m2 := _COMMENT_LINE_RE.match(buf, pos):
             comment_line = m2.group(1).strip()
-            s = m2.group(2)
+            pos = m2.end()
             if snt_cand := slot_value_in_double_colon_del_list(comment_line, 'snt'):
                 snt = snt_cand
             elif snt_id_cand := slot_value_in_double_colon_del_list(comment_line, 'id'):
                 snt_id = snt_id_cand
         # indent = ' '*4*rec_level
-        if snt_id and (m1 := re.match(r'(\(.*?\n(?:[ \t]+.*\S\s*?\n)*)', s)):
+        if snt_id and (m1 := _AMR_LINES_RE.match(buf, pos)):
             amr_s = m1.group(1)
-        if m3 := re.match(r'\s*\(([a-z]\d*)\s*/\s*([a-z][a-z0-9]*(?:-[a-z0-9]+)*)(.*)', s, re.DOTALL):
-            variable, concept, s = m3.group(1, 2, 3)
+        if m3 := _NODE_OPEN_RE.match(buf, pos):
+            # interned, as these strings are compared and used as dictionary keys many times
+            variable, concept = sys.intern(m3.group(1)), sys.intern(m3.group(2))
+            pos = m3.end()
             amr_node = AMRnode(concept, parent=parent, variable=variable)
             self.variable_to_amr_node[variable] = amr_node
+            # resolve earlier references to this variable right away
+            for parent_amr_node, child_index in self.orphan_variables.pop(variable, ()):
+                parent_amr_node.replace_sub(child_index, amr_node)
             if self.root is None:
                 self.root = amr_node
-            while m_role := re.match(r'\s*:([a-z][a-z0-9]*(?:-[a-z0-9]+)*)(.*)', s, re.DOTALL | re.IGNORECASE):
-                role, s = m_role.group(1, 2)
+            while m_role := _ROLE_RE.match(buf, pos):
+                role = sys.intern(m_role.group(1))
+                pos = m_role.end()
+                # one match for all kinds of sub: AMR (only looked ahead), quoted string, variable, non-quoted string
+                m_sub = _SUB_RE.match(buf, pos)
+                sub_kind = m_sub and m_sub.lastindex
                 # sub is AMR
-                if re.match(r'\s*\(', s, re.DOTALL):
-                    sub_amr, s, sub_errors, _snt_id, _snt, _amr_s = self.string_to_amr(s, rec_level=rec_level+1)
+                if sub_kind == 1:
+                    sub_amr, pos, sub_errors, _snt_id, _snt, _amr_s = self.parse_amr(buf, pos, rec_level=rec_level+1)
                     errors.extend(sub_errors)
                     if sub_amr:
-                        amr_node.subs.append((role, sub_amr))
+                        amr_node.add_sub(role, sub_amr)
                         sub_amr.parents.append(amr_node)
                     else:
-                        errors.append(f'Unexpected non-AMR: {s}')
-                        return amr_node, s, errors, snt_id, snt, amr_s
+                        errors.append(f'Unexpected non-AMR: {buf[pos:]}')
+                        return amr_node, pos, errors, snt_id, snt, amr_s
                 # sub is quoated string
-                elif m_string := re.match(r'\s*"((?:\\"|[^"]+)*)"(.*)', s, re.DOTALL):
-                    quoted_string_value, s = m_string.group(1, 2)
-                    amr_node.subs.append((role, quoted_string_value))
+                elif sub_kind == 2:
+                    pos = m_sub.end()
+                    amr_node.add_sub(role, m_sub.group(2))
                 # sub is reentrancy variable
-                elif m_string := re.match(r'\s*([a-z]\d*)(?![a-z])(.*)', s, re.DOTALL):
-                    ref_variable, s = m_string.group(1, 2)
+                elif sub_kind == 3:
+                    ref_variable = m_sub.group(3)
+                    pos = m_sub.end()
                     if ref_amr := self.variable_to_amr_node.get(ref_variable):
-                        amr_node.subs.append((role, ref_amr))
+                        amr_node.add_sub(role, ref_amr)
                     else:
                         self.orphan_variables[ref_variable].append((amr_node, len(amr_node.subs)))
-                        amr_node.subs.append((role, None))
+                        amr_node.add_sub(role, None)
                 # sub is non-quoted string
-                elif m_string := re.match(r'\s*([^\s()]+)(.*)', s, re.DOTALL):
-                    unquoted_string_value, s = m_string.group(1, 2)
-                    amr_node.subs.append((role, unquoted_string_value))
+                elif sub_kind == 4:
+                    pos = m_sub.end()
+                    amr_node.add_sub(role, m_sub.group(4))
                 else:
-                    errors.append(f'Unexpected :{role} arg: {s}')
-                    return amr_node, s, errors, snt_id, snt, amr_s
-            if m_rest := re.match(r'\s*\)(.*)', s, re.DOTALL):
-                s = m_rest.group(1)
+                    errors.append(f'Unexpected :{role} arg: {buf[pos:]}')
+                    return amr_node, pos, errors, snt_id, snt, amr_s
+            if m_rest := _CLOSE_PAREN_RE.match(buf, pos):
+                pos = m_rest.end()
             else:
-                errors.append(f'Inserting missing ) at: {snt_id or s}')
+                errors.append(f'Inserting missing ) at: {snt_id or buf[pos:]}')
             if rec_level == 0:
+                # remaining orphan references are to variables that were never defined
                 for ref_variable in self.orphan_variables.keys():
-                    if ref_amr_node := self.variable_to_amr_node.get(ref_variable):
-                        for orphan_location in self.orphan_variables[ref_variable]:
-                            parent_amr_node, child_index = orphan_location
-                            role = parent_amr_node.subs[child_index][0]
-                            parent_amr_node.subs[child_index] = (role, ref_amr_node)
-                    else:
-                        errors.append(f"Error: For {snt_id}, can't resolve orphan reference {ref_variable}")
-            return amr_node, s, errors, snt_id, snt, amr_s
+                    errors.append(f"Error: For {snt_id}, can't resolve orphan reference {ref_variable}")
+            return amr_node, pos, errors, snt_id, snt, amr_s
         else:
-            return None, "", errors, snt_id, snt, amr_s
+            return None, len(buf), errors, snt_id, snt, amr_s
 
     def amr_to_string(self, amr_node: AMRnode = None, rec_level: int = 0, no_indent: bool = False) -> str:
         if amr_node is None:
             amr_node = self.root
-            self.previously_printed_variables = []
-        indent = ' '*6*(rec_level+1)
-        concept = amr_node.concept
-        variable = amr_node.variable
-        result = f"({variable} / {concept}"
-        for role, sub in amr_node.subs:
+            self.previously_printed_variables = set()
+        parts = [f"({amr_node.variable} / {amr_node.concept}"]
+        # explicit stack instead of recursion; frame: [amr_node, index of next sub, rec_level, no_indent]
+        stack = [[amr_node, 0, rec_level, no_indent]]
+        amr_nodes_in_progress = {amr_node}
+        while stack:
+            frame = stack[-1]
+            amr_node, sub_index, rec_level, no_indent = frame
+            if sub_index == len(amr_node.subs):
+                parts.append(')')
+                stack.pop()
+                amr_nodes_in_progress.discard(amr_node)
+                if stack:
+                    self.previously_printed_variables.add(amr_node.variable)
+                continue
+            frame[1] += 1
+            role, sub = amr_node.subs[sub_index]
             if role == "name" and isinstance(sub, AMRnode) and sub.concept == "name":
-                no_indent = True
+                no_indent = frame[3] = True
             if no_indent:
-                result += f" :{role} "
+                parts.append(f" :{role} ")
             else:
-                result += f"\n{indent}:{role} "
+                parts.append(f"\n{' '*6*(rec_level+1)}:{role} ")
             if isinstance(sub, AMRnode):
                 if sub.variable in self.previously_printed_variables:
-                    result += sub.variable
+                    parts.append(sub.variable)
+                elif sub in amr_nodes_in_progress:
+                    # a cycle back to a node that is still being printed would otherwise be printed forever
+                    raise RecursionError(f'Cyclic AMR at variable {sub.variable}')
                 else:
-                    result += self.amr_to_string(amr_node=sub, rec_level=rec_level+1, no_indent=no_indent)
-                    self.previously_printed_variables.append(sub.variable)
+                    parts.append(f"({sub.variable} / {sub.concept}")
+                    stack.append([sub, 0, rec_level+1, no_indent])
+                    amr_nodes_in_progress.add(sub)
             elif isinstance(sub, str):
-                result += f'"{sub}"'
+                parts.append(f'"{sub}"')
             # elif isinstance(sub, int)
-        result += ')'
-        return result
+        return ''.join(parts)
 
     @staticmethod
     def sub_amr_node_by_role(amr_node, roles) -> Optional[Union[AMRnode, str]]:
-        for role, sub in amr_node.subs:
-            if role in roles:
-                return sub
+        for role in roles:
+            if subs := amr_node.subs_by_role.get(role):
+                return subs[0]
         return None
 
     @staticmethod
@@ -198,92 +367,90 @@ class AMR:
 
     @staticmethod
     def sub_amr_concept_by_role(amr_node, roles) -> Optional[str]:
-        for role, sub in amr_node.subs:
-            if role in roles:
-                return sub.concept
+        for role in roles:
+            if subs := amr_node.subs_by_role.get(role):
+                return subs[0].concept
         return None
 
     @staticmethod
     def parents(amr_node) -> list[AMRnode]:
         return amr_node.parents
 
-    def parent_is_in_concepts(self, amr_node, concepts: list[str]) -> bool:
+    def parent_is_in_concepts(self, amr_node, concepts: Union[list[str], frozenset[str]]) -> bool:
         for parent in self.parents(amr_node):
             if parent.concept in concepts:
                 return True
         return False
 
-    def ancestor_is_in_concepts(self, amr_node, concepts: list[str],
-                                visited_amr_nodes: Optional[list[AMRnode]] = None) -> bool:
-        # Avoid loops
-        if visited_amr_nodes and amr_node in visited_amr_nodes:
-            return False
-        if visited_amr_nodes is None:
-            visited_amr_nodes = []
-        for parent in self.parents(amr_node):
-            if parent.concept in concepts:
-                return True
-            visited_amr_nodes.append(amr_node)
-            if self.ancestor_is_in_concepts(parent, concepts, visited_amr_nodes):
+    def ancestor_is_in_concepts(self, amr_node, concepts: Union[list[str], frozenset[str]]) -> bool:
+        # iterative, with visited set to avoid loops
+        visited_amr_nodes = {amr_node}
+        stack = list(self.parents(amr_node))
+        while stack:
+            ancestor = stack.pop()
+            if ancestor in visited_amr_nodes:
+                continue
+            visited_amr_nodes.add(ancestor)
+            if ancestor.concept in concepts:
                 return True
+            stack.extend(self.parents(ancestor))
         return False
 
     def ne_amr_to_name(self, amr_node) -> str:
-        if isinstance(amr_node, AMRnode) and amr_node.concept in ['country', 'province', 'sea']:
+        if isinstance(amr_node, AMRnode) and amr_node.concept in _NAMED_ENTITY_CONCEPTS:
             if (name_amr_node := self.sub_amr_node_by_role(amr_node, ['name'])) \
                     and name_amr_node.concept == 'name':
-                name_elements = []
-                i = 1
-                while op := self.sub_amr_node_by_role(name_amr_node, [f"op{i}"]):
-                    name_elements.append(op)
-                    i += 1
-                return ' '.join(name_elements)
+                if amr_node._ne_name is None:
+                    name_elements = []
+                    i = 1
+                    while op := self.sub_amr_node_by_role(name_amr_node, [op_role(i)]):
+                        name_elements.append(op)
+                        i += 1
+                    amr_node._ne_name = ' '.join(name_elements)
+                return amr_node._ne_name
         return ''
 
     def match_for_daide(self, amr_node: AMRnode, target_s: str, in_dict: Optional[dict] = None) -> Optional[dict]:
+        if template := daide_template(target_s):
+            return self.match_daide_template(amr_node, template, in_dict)
+        return None
+
+    def match_daide_template(self, amr_node: AMRnode, template: DaideTemplate, in_dict: Optional[dict] = None) \
+            -> Optional[dict]:
         warnings = []
-        if m2 := re.match(r'\((\S+)\s+(.*)\)$', target_s):
-            result = in_dict or {'match': True}
-            concept = amr_node.concept
-            instance_s = m2.group(1)
-            if instance_s == concept:
-                pass
-            elif ((m2b := re.match(r'\$([a-z][a-z0-9]*)\((.*)\)$', instance_s))
-                    and (concept in m2b.group(2).split('|'))):
-                result[m2b.group(1)] = daide.name_to_id.get(concept) or concept
-            elif m1 := re.match(r'\$([a-z][a-z0-9]*)$', instance_s):
-                result[m1.group(1)] = daide.name_to_id.get(concept) or concept
-            else:
+        result = in_dict or {'match': True}
+        concept = amr_node.concept
+        head = template.head
+        if head.var is None:
+            if head.concept != concept:
                 return None
-            for arg_value in regex.findall(r':([a-z][-a-z0-9]*)\s+([^\s()]+(?:\([^\s()]+\))?'
-                                           r'|(\((?:[^()]++|(?3))*\))(?:\([^\s()]+\))?)',
-                                           m2.group(2), re.IGNORECASE):
-                arg, value = arg_value[0], arg_value[1]
-                if sub_amr_node := self.sub_amr_node_by_role(amr_node, [arg]):
-                    sub_concept = sub_amr_node.concept
-                    if value == sub_concept:
-                        pass
-                    elif ((m2c := (re.match(r'\$([a-z][a-z0-9]*)\((.*)\)$', value)
-                                   or re.match(r'\$([a-z][a-z0-9]*)$', value)))
-                            and ((m2c.lastindex == 1) or (sub_concept in m2c.group(2).split('|')))):
-                        var = m2c.group(1)
-                        if sub_name := self.ne_amr_to_name(sub_amr_node):
-                            result[var] = daide.name_to_id.get(sub_name) or sub_name
-                        elif sub_amr_node.subs:
-                            result[var], sub_warnings = self.amr_to_daide(sub_amr_node, top=False) or sub_concept
-                            warnings = self.extend_new_warnings(warnings, sub_warnings)
-                        else:
-                            result[var] = daide.name_to_id.get(sub_concept) or sub_concept
-                    elif has_matching_outer_parentheses(value):
-                        if self.match_for_daide(sub_amr_node, value, result) is None:
-                            return None
+        elif head.concepts is None or concept in head.concepts:
+            result[head.var] = _NAME_TO_ID.get(concept, concept)
+        else:
+            return None
+        for arg, value in template.args:
+            if sub_amr_node := self.sub_amr_node_by_role(amr_node, [arg]):
+                sub_concept = sub_amr_node.concept
+                if value.var is not None:
+                    if value.concepts is not None and sub_concept not in value.concepts:
+                        return None
+                    var = value.var
+                    if sub_name := self.ne_amr_to_name(sub_amr_node):
+                        result[var] = _NAME_TO_ID.get(sub_name, sub_name)
+                    elif sub_amr_node.subs:
+                        result[var], sub_warnings = self.amr_to_daide(sub_amr_node, top=False) or sub_concept
+                        warnings = self.extend_new_warnings(warnings, sub_warnings)
                     else:
+                        result[var] = _NAME_TO_ID.get(sub_concept, sub_concept)
+                elif value.sub_template:
+                    if self.match_daide_template(sub_amr_node, value.sub_template, result) is None:
                         return None
-                else:
+                elif value.concept != sub_concept:
                     return None
-            result['warnings'] = warnings
-            return result
-        return None
+            else:
+                return None
+        result['warnings'] = warnings
+        return result
 
     @staticmethod
     def extend_new_warnings(warnings: list[str], new_warnings: list[str]):
@@ -295,57 +462,49 @@ class AMR:
     def add_warning_to_match_dict(self, match_dict, warning):
         match_dict['warnings'] = self.extend_new_warnings(match_dict.get('warnings', []), [warning])
 
-    def amr_to_daide(self, amr_node: AMRnode = None, top: bool = True) -> Tuple[str, list[str]]:
-        # returns pair of (daide_element, warnings)
-        warnings = []
-        if amr_node is None:
-            amr_node = self.root
-        if (entity_name := self.ne_amr_to_name(amr_node)) \
-                and (daide_id := daide.name_to_id.get(entity_name)):
-            return daide_id, warnings
-        concept = amr_node.concept
-        if concept == 'and':
-            daide_elements = []
-            i = 1
-            while op_amr_node := self.sub_amr_node_by_role(amr_node, [f"op{i}"]):
-                daide_element, sub_warnings = self.amr_to_daide(op_amr_node, top=False)
-                warnings = self.extend_new_warnings(warnings, sub_warnings)
-                if daide_element:
-                    if ' ' in daide_element and not has_matching_outer_parentheses(daide_element):
-                        daide_element = '(' + daide_element + ')'
-                    daide_elements.append(daide_element)
-                    i += 1
-            if self.parent_is_in_concepts(amr_node, ['ally-01', 'demilitarize-01']):
-                return ' '.join(daide_elements), warnings
-            else:
-                return f"AND {' '.join(daide_elements)}", warnings
+    def unit_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node,
                                      '($utype(army|fleet) :mod $power(country) :location $location(sea|province))'):
             return self.match_map(amr_node, d, '($power $utype $location)')
+        return None
+
+    def move_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(move-01 :ARG1 $unit :ARG2 $destination)'):
             if top:
                 self.add_warning_to_match_dict(d, 'MTO at top level')
             return self.match_map(amr_node, d, '$unit MTO $destination')
+        return None
+
+    def coast_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(coast :location ($compass(north|east|south|west)'
                                                ' :part-of $province(province)))'):
             return self.match_map(amr_node, d, '($province $compass)')
+        return None
+
+    def hold_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(hold-03 :ARG1 $unit)'):
             unit = d.get('unit', '')
             if top:
                 self.add_warning_to_match_dict(d, 'HLD at top level')
-            if not re.match(r'^\([A-Z]{3} (?:AMY|FLT) ', unit):
+            if not _SPECIFIC_UNIT_RE.match(unit):
                 self.add_warning_to_match_dict(d, f"HLD unit must be a specific unit, not {unit}")
             return self.match_map(amr_node, d, '$unit HLD')
+        return None
+
+    def support_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(support-01 :ARG0 $supporter :ARG1 $supportee)'):
             supporter = d.get('supporter', '')
             supportee = d.get('supportee', '')
-            if not re.match(r'^\([A-Z]{3} (?:AMY|FLT) ', supporter):
+            if not _SPECIFIC_UNIT_RE.match(supporter):
                 self.add_warning_to_match_dict(d, f"SUP supporter must be a specific unit, not {supporter}")
-            if not re.match(r'^\([A-Z]{3} (?:AMY|FLT) ', supportee):
+            if not _SPECIFIC_UNIT_RE.match(supportee):
                 self.add_warning_to_match_dict(d, f"SUP supportee must be a specific unit, not {supportee}")
             if top:
                 self.add_warning_to_match_dict(d, 'SUP at top level')
             return self.match_map(amr_node, d, '$supporter SUP $supportee')
+        return None
+
+    def ally_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(ally-01 :ARG1 $allies :ARG3 $ennemies)'):
             if top:
                 self.add_warning_to_match_dict(d, 'ALY at top level')
@@ -355,18 +514,30 @@ class AMR:
             if top:
                 self.add_warning_to_match_dict(d, 'ALY at top level')
             return self.match_map(amr_node, d, 'ALY ($allies)')
+        return None
+
+    def submit_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(submit-01 :ARG1 $submission)'):
             return self.match_map(amr_node, d, 'SUB $submission')
+        return None
+
+    def propose_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(propose-01 :ARG1 $proposal(build-01|hold-03|move-01|remove-01'
                                                '|retreat-01|support-01|transport-01))'):
             return self.match_map(amr_node, d, 'PRP (XDO ($proposal))')
         if d := self.match_for_daide(amr_node, '(propose-01 :ARG1 $proposal)'):
             return self.match_map(amr_node, d, 'PRP ($proposal)')
+        return None
+
+    def build_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(build-01 :ARG0 $power(country) :ARG1 $utype(army|fleet) '
                                                ':location $location(province))'):
             if top:
                 self.add_warning_to_match_dict(d, 'BLD at top level')
             return self.match_map(amr_node, d, '($power $utype $location) BLD')
+        return None
+
+    def agree_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(agree-01 :ARG1 $proposal(build-01|hold-03|move-01|remove-01'
                                                '|retreat-01|support-01|transport-01))'):
             return self.match_map(amr_node, d, 'YES (PRP (XDO ($proposal)))')
@@ -374,8 +545,14 @@ class AMR:
             return self.match_map(amr_node, d, 'YES (PRP ($proposal))')
         if d := self.match_for_daide(amr_node, '(agree-01 :ARG1 $proposal)'):
             return self.match_map(amr_node, d, 'YES ($proposal)')
+        return None
+
+    def reject_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(reject-01 :ARG1 $proposal)'):
             return self.match_map(amr_node, d, 'REJ ($proposal)')
+        return None
+
+    def demilitarize_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(demilitarize-01 :ARG1 $powers :ARG2 $locations)'):
             for location_id in re.findall(r'[A-Z]+', d.get('locations', '')):
                 if not daide.province_name.get(location_id):
@@ -383,10 +560,16 @@ class AMR:
             if top:
                 self.add_warning_to_match_dict(d, 'DMZ at top level')
             return self.match_map(amr_node, d, 'DMZ ($powers) ($locations)')
+        return None
+
+    def remove_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(remove-01 :ARG1 $unit(army|fleet))'):
             if top:
                 self.add_warning_to_match_dict(d, 'REM at top level')
             return self.match_map(amr_node, d, '$unit REM')
+        return None
+
+    def transport_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(transport-01 :ARG1 $army(army) :ARG3 $destination(province) '
                                                ':ARG4 $path(sea))'):
             if top:
@@ -397,20 +580,65 @@ class AMR:
             if top:
                 self.add_warning_to_match_dict(d, 'CVY at top level')
             return self.match_map(amr_node, d, '$fleet CVY $army CTO $destination')
+        return None
+
+    def retreat_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(retreat-01 :ARG1 $unit(army|fleet) '
                                                ':destination $destination(province|sea))'):
             if top:
                 self.add_warning_to_match_dict(d, 'RTO at top level')
             return self.match_map(amr_node, d, '$unit RTO $destination')
+        return None
+
+    def have_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if (d := self.match_for_daide(amr_node, '(have-03 :ARG0 $owner(country) :ARG1 $province(province))')) \
-                and self.ancestor_is_in_concepts(amr_node, ['propose-01', 'agree-01']):
+                and self.ancestor_is_in_concepts(amr_node, _SCD_ANCESTOR_CONCEPTS):
             return self.match_map(amr_node, d, 'SCD ($owner $province)')
+        return None
+
+    def peace_to_daide(self, amr_node: AMRnode, top: bool) -> Optional[Tuple[str, list[str]]]:
         if d := self.match_for_daide(amr_node, '(peace :op1 $c1(country) :op2 $c2(country) :op3 $c3(country))'):
             return self.match_map(amr_node, d, 'PCE ($c1 $c2 $c3)')
         if d := self.match_for_daide(amr_node, '(peace :op1 $c1(country) :op2 $c2(country))'):
             if top:
                 self.add_warning_to_match_dict(d, 'PCE at top level')
             return self.match_map(amr_node, d, 'PCE ($c1 $c2)')
+        return None
+
+    def amr_to_daide(self, amr_node: AMRnode = None, top: bool = True) -> Tuple[str, list[str]]:
+        # returns pair of (daide_element, warnings); cached on the AMR node for reentrancies, except at top level
+        if amr_node is None:
+            amr_node = self.root
+        if top or not isinstance(amr_node, AMRnode):
+            return self.uncached_amr_to_daide(amr_node, top)
+        if amr_node._daide is None:
+            amr_node._daide = self.uncached_amr_to_daide(amr_node, top)
+        return amr_node._daide
+
+    def uncached_amr_to_daide(self, amr_node: AMRnode, top: bool) -> Tuple[str, list[str]]:
+        warnings = []
+        if (entity_name := self.ne_amr_to_name(amr_node)) \
+                and (daide_id := _NAME_TO_ID.get(entity_name)):
+            return daide_id, warnings
+        concept = amr_node.concept
+        if concept == 'and':
+            daide_elements = []
+            i = 1
+            while op_amr_node := self.sub_amr_node_by_role(amr_node, [op_role(i)]):
+                daide_element, sub_warnings = self.amr_to_daide(op_amr_node, top=False)
+                warnings = self.extend_new_warnings(warnings, sub_warnings)
+                if daide_element:
+                    if ' ' in daide_element and not has_matching_outer_parentheses(daide_element):
+                        daide_element = '(' + daide_element + ')'
+                    daide_elements.append(daide_element)
+                    i += 1
+            if self.parent_is_in_concepts(amr_node, _PLAIN_LIST_PARENT_CONCEPTS):
+                return ' '.join(daide_elements), warnings
+            else:
+                return f"AND {' '.join(daide_elements)}", warnings
+        if (daide_handler := self.daide_handler_by_concept.get(concept)) \
+                and (daide_result := daide_handler(self, amr_node, top)):
+            return daide_result
         result = f'({concept}'
         for role, sub in amr_node.subs:
             result += f" :{role} "
@@ -423,21 +651,40 @@ class AMR:
         result += ')'
         return result, warnings
 
+    # DAIDE templates are specific to the concept of the AMR node, so amr_to_daide only tries those of its concept
+    daide_handler_by_concept = {'army': unit_to_daide, 'fleet': unit_to_daide, 'move-01': move_to_daide,
+                                'coast': coast_to_daide, 'hold-03': hold_to_daide, 'support-01': support_to_daide,
+                                'ally-01': ally_to_daide, 'submit-01': submit_to_daide, 'propose-01': propose_to_daide,
+                                'build-01': build_to_daide, 'agree-01': agree_to_daide, 'reject-01': reject_to_daide,
+                                'demilitarize-01': demilitarize_to_daide, 'remove-01': remove_to_daide,
+                                'transport-01': transport_to_daide, 'retreat-01': retreat_to_daide,
+                                'have-03': have_to_daide, 'peace': peace_to_daide}
+
     @staticmethod
     def file_to_amrs(filename: str, max_n: Optional[int]) -> Tuple[list, list, list, list, list]:
-        s = ""
+        amr_roots, snt_ids, snts, errors, amr_strings = result_lists = [], [], [], [], []
         with open(filename) as f:
-            s += f.read()
+            for record in iter_amr_records(f):
+                record_max_n = None if max_n is None else max_n - len(amr_roots)
+                for result_list, record_result_list in zip(result_lists, AMR.string_to_amrs(record, record_max_n)):
+                    result_list.extend(record_result_list)
+                if max_n is not None and len(amr_roots) >= max_n:
+                    break
+        return amr_roots, snt_ids, snts, errors, amr_strings
+
+    @staticmethod
+    def string_to_amrs(buf: str, max_n: Optional[int] = None) -> Tuple[list, list, list, list, list]:
+        pos = 0
         n_amrs = 0
         amr_roots = []
         snt_ids = []
         snts = []
         errors = []
         amr_strings = []
-        while re.match(r'\s*\S', s):
-            orig_s = s
+        while _NON_SPACE_RE.match(buf, pos):
+            orig_pos = pos
             amr = AMR()
-            amr_node, s, error_list, snt_id, snt, amr_s = amr.string_to_amr(s)
+            amr_node, pos, error_list, snt_id, snt, amr_s = amr.parse_amr(buf, pos)
             if amr_node:
                 amr.root = amr_node
                 amr_roots.append(amr)
@@ -447,7 +694,7 @@ class AMR:
                 amr_strings.append(amr_s)
                 n_amrs += 1
             else:
-                print(f'Break at\n{orig_s[0:500]}')
+                print(f'Break at\n{buf[orig_pos:orig_pos+500]}')
                 print(f'{0/0}')
                 break
             if max_n is not None and n_amrs >= max_n:
@@ -456,11 +703,53 @@ class AMR:
 
 
 daide = Daide(os.path.join(data_dir_path, 'diplomacy-resources.txt'))
+_NAME_TO_ID = daide.name_to_id
 extended_amr_concepts1 = ['attack-01', 'betray-01', 'defend-01', 'dislodge-01', 'expect-01', 'fear-01',
                           'gain-02', 'lie-08', 'lose-02', 'possible-01', 'prevent-01', 'threaten-01',
                           'trust-01', 'warn-01']
 
 
+def translate_amrs(s: str, max_n: Optional[int] = None) -> Iterator[tuple]:
+    """Parses AMRs in string s and maps them to DAIDE. Yields for each AMR a tuple
+    (snt_id, snt, errors, amr_s, amr_s2, daide_s, warnings),
+    with amr_s2 (the reprinted AMR) None in case of a RecursionError."""
+    for amr, snt_id, snt, error_list, amr_s in zip(*AMR.string_to_amrs(s, max_n)):
+        try:
+            amr_s2 = amr.amr_to_string()
+        except RecursionError:
+            yield snt_id, snt, error_list, amr_s, None, '', []
+            continue
+        if amr_s2 == '(a / amr-empty)':
+            daide_s, warnings = '', []
+        else:
+            daide_s, warnings = amr.amr_to_daide()
+        yield snt_id, snt, error_list, amr_s, amr_s2, daide_s, warnings
+
+
+def translate_amr_record(record: str) -> list[tuple]:
+    # runs in a worker process
+    return list(translate_amrs(record))
+
+
+def translate_amr_file(filename: str, max_n: Optional[int], jobs: int = 1) -> Iterator[tuple]:
+    """Like translate_amrs, but streams the AMR records of a file, optionally distributed over worker processes.
+    Yields in input order."""
+    with open(filename) as f:
+        records = iter_amr_records(f)
+        if jobs > 1:
+            # each record has at least one AMR, so max_n records suffice; executor.map submits them all up front
+            executor = ProcessPoolExecutor(jobs)
+            try:
+                yield from islice(chain.from_iterable(executor.map(translate_amr_record, islice(records, max_n),
+                                                                   chunksize=64)),
+                                  max_n)
+            finally:
+                # don't wait for the translation of records that won't be used, e.g. after an error in the caller
+                executor.shutdown(cancel_futures=True)
+        else:
+            yield from islice(chain.from_iterable(map(translate_amrs, records)), max_n)
+
+
 def main_test():
     amr = AMR()
     amr_s = '(a / army :mod (c / country :name (n / name :op1 "Italy")) ' \
@@ -484,6 +773,9 @@ def main():
     parser.add_argument('-m', '--max', type=int, default=None, help='(maximum number of AMRs in ouput)')
     parser.add_argument('-d', '--developer_mode', action='count', default=0)
     parser.add_argument('-v', '--verbose', action='count', default=0, help='write change log etc. to STDERR')
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='number of worker processes (default: 1); the input is distributed over them at blank '
+                             'lines between AMRs')
     args = parser.parse_args()
     n_amrs = 0
     n_amr_empty = 0
@@ -494,83 +786,87 @@ def main():
     extended_concept_counter1 = defaultdict(int)
     extended_concept_counter2 = defaultdict(int)
     snt_ids_with_recursion_error = []
-    amrs, snt_ids, snts, errors, amr_strings \
-        = AMR.file_to_amrs(args.input, args.max)
-    out = args.output
-    for amr, snt_id, snt, error_list, amr_s in zip(amrs, snt_ids, snts, errors, amr_strings):
-        n_amrs += 1
-        daide_problematic = False
-        show_daide_in_dev_mode = True
-        try:
-            amr_s2 = amr.amr_to_string()
-        except RecursionError:
-            snt_ids_with_recursion_error.append(snt_id)
-            print(f'RecursionError for {snt_id}')
-            continue
-        if amr_s2 == '(a / amr-empty)':
-            n_amr_empty += 1
-            show_daide_in_dev_mode = False
-            daide_s, warnings = '', []
-        else:
-            daide_s, warnings = amr.amr_to_daide()
-            if extended_amr_concepts := re.findall(r'([a-z]\S*-\d\d\b)', daide_s):
-                if set(extended_amr_concepts1) & set(extended_amr_concepts):
-                    n_amr_with_extended_concept1 += 1
-                    for extended_amr_concept in extended_amr_concepts:
-                        if extended_amr_concept in extended_amr_concepts1:
-                            extended_concept_counter1[extended_amr_concept] += 1
-                    show_daide_in_dev_mode = False
-                else:
-                    n_amr_with_extended_concept2 += 1
-                    for extended_amr_concept in extended_amr_concepts:
-                        extended_concept_counter2[extended_amr_concept] += 1
-                daide_problematic = True
-            if '(unit ' in daide_s \
-                    or re.search(r'\((?:army|fleet) :(?:mod|location) [A-Z]{3}\)', daide_s):
-                n_underspecified_unit += 1
-                daide_problematic = True
+    snt_ids = []
+    out_write = args.output.write
+    json_file = args.json
+    dumps = json.dumps
+    json_lines = []
+    write_out = not (json_file and args.output == sys.stdout)
+    results = translate_amr_file(args.input, args.max, args.jobs)
+    try:
+        for snt_id, snt, error_list, amr_s, amr_s2, daide_s, warnings in results:
+            n_amrs += 1
+            snt_ids.append(snt_id)
+            daide_problematic = False
+            show_daide_in_dev_mode = True
+            if amr_s2 is None:
+                snt_ids_with_recursion_error.append(snt_id)
+                print(f'RecursionError for {snt_id}')
+                continue
+            daide_has_lowercase = _LOWERCASE_RE.search(daide_s) is not None
+            if amr_s2 == '(a / amr-empty)':
+                n_amr_empty += 1
                 show_daide_in_dev_mode = False
-            if re.search('[a-z]', daide_s):
-                daide_problematic = True
-        if regex.search(r'[A-Z]{3}', daide_s):
-            if regex.search(r'[a-z]', daide_s):
-                daide_status = 'Partial-DAIDE'
-            elif warnings:
-                daide_status = 'Para-DAIDE'
             else:
-                daide_status = 'Full-DAIDE'
-        else:
-            daide_status = 'No-DAIDE'
-        if ((not args.developer_mode) or show_daide_in_dev_mode) and not (args.json and args.output == sys.stdout):
-            out.write(f'# ::id {snt_id}\n')
-            out.write(f'# ::snt {snt}\n')
-            for error in error_list:
-                out.write(f'# ::error {error}\n')
-            out.write(f'AMR:\n{amr_s.strip()}\n')
-            # out.write(f'AMR string (r): {amr_s2.strip()}\n')
-            if daide_status == 'Full-DAIDE':
-                out.write(f'DAIDE: {daide_s}\n')
-            elif daide_status == 'Partial-DAIDE':
-                out.write(f'PARTIAL-DAIDE: {daide_s}\n')
-            elif daide_status == 'Para-DAIDE':
-                out.write(f'PARA-DAIDE: {daide_s}\n')
+                if extended_amr_concepts := _EXTENDED_AMR_CONCEPT_RE.findall(daide_s):
+                    if set(extended_amr_concepts1) & set(extended_amr_concepts):
+                        n_amr_with_extended_concept1 += 1
+                        for extended_amr_concept in extended_amr_concepts:
+                            if extended_amr_concept in extended_amr_concepts1:
+                                extended_concept_counter1[extended_amr_concept] += 1
+                        show_daide_in_dev_mode = False
+                    else:
+                        n_amr_with_extended_concept2 += 1
+                        for extended_amr_concept in extended_amr_concepts:
+                            extended_concept_counter2[extended_amr_concept] += 1
+                    daide_problematic = True
+                if '(unit ' in daide_s \
+                        or _UNDERSPECIFIED_UNIT_RE.search(daide_s):
+                    n_underspecified_unit += 1
+                    daide_problematic = True
+                    show_daide_in_dev_mode = False
+                if daide_has_lowercase:
+                    daide_problematic = True
+            if _DAIDE_TOKEN_RE.search(daide_s):
+                if daide_has_lowercase:
+                    daide_status = 'Partial-DAIDE'
+                elif warnings:
+                    daide_status = 'Para-DAIDE'
+                else:
+                    daide_status = 'Full-DAIDE'
             else:
-                out.write('NO-DAIDE\n')
-            out.write('\n')
-        if args.json:
-            d = {'id': snt_id, 'snt': snt, 'amr': amr_s.strip(), 'daide-status': daide_status}
-            if daide_s:
-                d['daide'] = daide_s
-                if warnings:
-                    d['warnings'] = warnings
-            args.json.write(json.dumps(d) + "\n")
-        if not daide_problematic:
-            n_daide_without_problem += 1
+                daide_status = 'No-DAIDE'
+            if ((not args.developer_mode) or show_daide_in_dev_mode) and write_out:
+                error_lines = ''.join(f'# ::error {error}\n' for error in error_list)
+                if daide_status == 'Full-DAIDE':
+                    daide_line = f'DAIDE: {daide_s}'
+                elif daide_status == 'Partial-DAIDE':
+                    daide_line = f'PARTIAL-DAIDE: {daide_s}'
+                elif daide_status == 'Para-DAIDE':
+                    daide_line = f'PARA-DAIDE: {daide_s}'
+                else:
+                    daide_line = 'NO-DAIDE'
+                out_write(f'# ::id {snt_id}\n# ::snt {snt}\n{error_lines}AMR:\n{amr_s.strip()}\n{daide_line}\n\n')
+            if json_file:
+                d = {'id': snt_id, 'snt': snt, 'amr': amr_s.strip(), 'daide-status': daide_status}
+                if daide_s:
+                    d['daide'] = daide_s
+                    if warnings:
+                        d['warnings'] = warnings
+                json_lines.append(dumps(d) + '\n')
+                if len(json_lines) >= 1024:
+                    json_file.writelines(json_lines)
+                    json_lines.clear()
+            if not daide_problematic:
+                n_daide_without_problem += 1
+    finally:
+        if json_lines:
+            json_file.writelines(json_lines)
     if args.developer_mode:
-        out.write(f'Summary: {n_amrs} AMRs; {n_amr_empty} empty AMRs; {n_daide_without_problem} unproblematic; '
-                  f'{n_underspecified_unit} underspecified units; '
-                  f'{n_amr_with_extended_concept1}/{n_amr_with_extended_concept2} AMRs with extended concept\n')
-        out.write(f'Last snt-id: {snt_ids[-1]}')
+        out_write(f'Summary: {n_amrs} AMRs; {n_amr_empty} empty AMRs; {n_daide_without_problem} unproblematic; '
+                 f'{n_underspecified_unit} underspecified units; '
+                 f'{n_amr_with_extended_concept1}/{n_amr_with_extended_concept2} AMRs with extended concept\n')
+        out_write(f'Last snt-id: {snt_ids[-1]}')
         if snt_ids_with_recursion_error:
             sys.stderr.write(f'Recursion errors for {snt_ids_with_recursion_error}\n')
         for extended_concept in sorted(extended_concept_counter1.keys()):
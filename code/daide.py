@@ -7,20 +7,46 @@ Written by Ulf Hermjakob, USC/ISI
 import os
 from pathlib import Path
 import re
+import sys
 from typing import Optional, Tuple, Union
 
 data_dir = Path(__file__).parent.parent / 'data'
 data_dir_path = str(data_dir.resolve())
 
+_slot_value_re_cache: dict[str, re.Pattern] = {}
+_DOUBLE_COLON_SLOT_RE = re.compile(r'(?:^|\s+)::(?=\S)')
+_ORDER_RE = re.compile(r'\border\b')
+
 
 def slot_value_in_double_colon_del_list(line: str, slot: str, default: Optional = None) -> str:
     """For a given slot, e.g. 'cost', get its value from a line such as '::s1 of course ::s2 ::cost 0.3' -> 0.3
     The value can be an empty string, as for ::s2 in the example above."""
-    m = re.match(fr'(?:.*\s)?::{slot}(|\s+\S.*?)(?:\s+::\S.*|\s*)$', line)
+    if (slot_value_re := _slot_value_re_cache.get(slot)) is None:
+        slot_value_re = re.compile(fr'(?:.*\s)?::{slot}(|\s+\S.*?)(?:\s+::\S.*|\s*)$')
+        _slot_value_re_cache[slot] = slot_value_re
+    m = slot_value_re.match(line)
     return m.group(1).strip() if m else default
 
 
+def _parse_double_colon_line(line: str) -> dict[str, str]:
+    """Get all slot values of a line such as '::s1 of course ::s2 ::cost 0.3' in a single pass
+    -> {'s1': 'of course', 's2': '', 'cost': '0.3'}
+    As in slot_value_in_double_colon_del_list, the last value of a repeated slot wins."""
+    slots = {}
+    for field in _DOUBLE_COLON_SLOT_RE.split(line)[1:]:
+        slot_value = field.split(None, 1)
+        slots[slot_value[0]] = sys.intern(slot_value[1].strip()) if len(slot_value) > 1 else ''
+    return slots
+
+
+def freeze_daide_tree(tree: Union[list, str]) -> Union[tuple, str]:
+    """Converts a DAIDE list-tree into nested tuples, e.g. for use as dictionary key"""
+    return tuple([freeze_daide_tree(sub_tree) for sub_tree in tree]) if isinstance(tree, list) else tree
+
+
 class Daide:
+    max_english_cache_size = 4096
+
     def __init__(self, filename: str):
         self.power_name = {}
         self.province_name = {}
@@ -31,62 +57,87 @@ class Daide:
         self.name_uses_def_article = {}
         self.to_name = {}
         self.name_to_id = {}
+        self._power_or_location_name: dict[str, str] = {}  # power/province/sea id -> name
+        self._terminal_en: dict[str, str] = {}  # DAIDE token -> English, e.g. BLA -> the Black Sea
         self.sem_annotation = {}
         self.synt_annotation = {}
+        # (frozen DAIDE tree, form) -> English, at most max_english_cache_size entries
+        self._english_cache: dict[tuple, str] = {}
         self.load_resources(filename)
 
     def load_resources(self, filename: str) -> None:
         with open(filename, 'r') as f:
-            for line in f:
-                if line.startswith('::power-id '):
-                    power_id = slot_value_in_double_colon_del_list(line, 'power-id')
-                    power_name = slot_value_in_double_colon_del_list(line, 'power-name')
-                    if power_id and power_name:
-                        self.power_name[power_id] = power_name
-                        self.to_name[power_id] = power_name
-                        self.name_to_id[power_name] = power_id
-                elif line.startswith('::province-id '):
-                    province_id = slot_value_in_double_colon_del_list(line, 'province-id')
-                    province_name = slot_value_in_double_colon_del_list(line, 'province-name')
-                    if province_id and province_name:
-                        self.province_name[province_id] = province_name
-                        self.to_name[province_id] = province_name
-                        self.name_to_id[province_name] = province_id
-                elif line.startswith('::sea-id '):
-                    sea_id = slot_value_in_double_colon_del_list(line, 'sea-id')
-                    sea_name = slot_value_in_double_colon_del_list(line, 'sea-name')
-                    sea_alt_names = slot_value_in_double_colon_del_list(line, 'sea-alt-names')
-                    if sea_id and sea_name:
-                        self.sea_name[sea_id] = sea_name
-                        self.to_name[sea_id] = sea_name
-                        self.name_uses_def_article[sea_name] = True
-                        self.name_to_id[sea_name] = sea_id
-                        if sea_alt_names:
-                            for sea_alt_name in re.split(r'[,;]\s*', sea_alt_names):
-                                self.name_to_id[sea_alt_name] = sea_id
-                elif line.startswith('::unit-type-id '):
-                    unit_type_id = slot_value_in_double_colon_del_list(line, 'unit-type-id')
-                    unit_type_name = slot_value_in_double_colon_del_list(line, 'unit-type-name')
-                    if unit_type_id and unit_type_name:
-                        self.unit_type_name[unit_type_id] = unit_type_name
-                        self.to_name[unit_type_id] = unit_type_name
-                        self.name_to_id[unit_type_name] = unit_type_id
-                elif line.startswith('::coast-id '):
-                    coast_id = slot_value_in_double_colon_del_list(line, 'coast-id')
-                    coast_name = slot_value_in_double_colon_del_list(line, 'coast-name')
-                    coast_alt_names = slot_value_in_double_colon_del_list(line, 'coast-alt-names')
-                    if coast_id and coast_name:
-                        self.coast_name[coast_id] = coast_name
-                        self.to_name[coast_id] = coast_name
-                        if coast_alt_names:
-                            for coast_alt_name in re.split(r'[,;]\s*', coast_alt_names):
-                                self.name_to_id[coast_alt_name] = coast_id
-                elif line.startswith('::name '):
-                    name = slot_value_in_double_colon_del_list(line, 'name')
-                    pertainym = slot_value_in_double_colon_del_list(line, 'pertainym')
-                    if name and pertainym:
-                        self.pertainym[name] = pertainym
-                        self.to_name[pertainym] = name
+            for line in f.read().splitlines():
+                if resource_loader := self.resource_loader_by_prefix.get(line.partition(' ')[0]):
+                    resource_loader(self, _parse_double_colon_line(line))
+        # for an id of several kinds, power names take precedence over province names over sea names
+        for id_to_name in (self.sea_name, self.province_name, self.power_name):
+            self._power_or_location_name.update(id_to_name)
+        # English of single DAIDE tokens; location names take precedence, province names over sea names
+        self._terminal_en = dict(self.to_name)
+        for id_to_name in (self.sea_name, self.province_name):
+            for id_, location_name in id_to_name.items():
+                self._terminal_en[id_] = \
+                    f"the {location_name}" if self.name_uses_def_article.get(location_name) else location_name
+
+    def load_power(self, slots: dict[str, str]) -> None:
+        power_id = slots.get('power-id')
+        power_name = slots.get('power-name')
+        if power_id and power_name:
+            self.power_name[power_id] = power_name
+            self.to_name[power_id] = power_name
+            self.name_to_id[power_name] = power_id
+
+    def load_province(self, slots: dict[str, str]) -> None:
+        province_id = slots.get('province-id')
+        province_name = slots.get('province-name')
+        if province_id and province_name:
+            self.province_name[province_id] = province_name
+            self.to_name[province_id] = province_name
+            self.name_to_id[province_name] = province_id
+
+    def load_sea(self, slots: dict[str, str]) -> None:
+        sea_id = slots.get('sea-id')
+        sea_name = slots.get('sea-name')
+        sea_alt_names = slots.get('sea-alt-names')
+        if sea_id and sea_name:
+            self.sea_name[sea_id] = sea_name
+            self.to_name[sea_id] = sea_name
+            self.name_uses_def_article[sea_name] = True
+            self.name_to_id[sea_name] = sea_id
+            if sea_alt_names:
+                for sea_alt_name in re.split(r'[,;]\s*', sea_alt_names):
+                    self.name_to_id[sys.intern(sea_alt_name)] = sea_id
+
+    def load_unit_type(self, slots: dict[str, str]) -> None:
+        unit_type_id = slots.get('unit-type-id')
+        unit_type_name = slots.get('unit-type-name')
+        if unit_type_id and unit_type_name:
+            self.unit_type_name[unit_type_id] = unit_type_name
+            self.to_name[unit_type_id] = unit_type_name
+            self.name_to_id[unit_type_name] = unit_type_id
+
+    def load_coast(self, slots: dict[str, str]) -> None:
+        coast_id = slots.get('coast-id')
+        coast_name = slots.get('coast-name')
+        coast_alt_names = slots.get('coast-alt-names')
+        if coast_id and coast_name:
+            self.coast_name[coast_id] = coast_name
+            self.to_name[coast_id] = coast_name
+            if coast_alt_names:
+                for coast_alt_name in re.split(r'[,;]\s*', coast_alt_names):
+                    self.name_to_id[sys.intern(coast_alt_name)] = coast_id
+
+    def load_name(self, slots: dict[str, str]) -> None:
+        name = slots.get('name')
+        pertainym = slots.get('pertainym')
+        if name and pertainym:
+            self.pertainym[name] = pertainym
+            self.to_name[pertainym] = name
+
+    # load_resources looks up the loader of a resource line by its first token, e.g. '::power-id'
+    resource_loader_by_prefix = {'::power-id': load_power, '::province-id': load_province, '::sea-id': load_sea,
+                                 '::unit-type-id': load_unit_type, '::coast-id': load_coast, '::name': load_name}
 
     def parse_daide_tree(self, s: str,
                          rec_level: int = 0,
@@ -97,48 +148,42 @@ class Daide:
             max_index = len(s) - 1
         tree = []
         errors = []
-        while True:
-            if index <= max_index:
-                char = s[index]
-                current_index = index
-                index += 1  # next index
-                if char == ' ':
-                    pass
-                elif char == '(':
-                    sub_tree, sub_errors, sub_index = self.parse_daide_tree(s, rec_level+1, index, max_index)
-                    tree.append(sub_tree)
-                    index = sub_index
-                    errors.extend(sub_errors)
-                elif char == ')':
-                    if rec_level:
-                        return tree, errors, index
-                    else:
-                        errors.append(f'Ignoring spurious close parenthesis at position {current_index}')
-                elif char.isalpha():
-                    element = char
-                    while index <= max_index and s[index].isalpha():
-                        element += s[index]
-                        index += 1
-                    tree.append(element)
+        stack = []  # enclosing trees of the current tree
+        while index <= max_index:
+            char = s[index]
+            current_index = index
+            index += 1  # next index
+            if char == ' ':
+                pass
+            elif char == '(':
+                sub_tree = []
+                tree.append(sub_tree)
+                stack.append(tree)
+                tree = sub_tree
+            elif char == ')':
+                if stack:
+                    tree = stack.pop()
+                elif rec_level:
+                    return tree, errors, index
                 else:
-                    errors.append(f'Ignoring spurious character {char} at position {current_index}')
-            elif rec_level == 0:
-                return tree, errors, index
+                    errors.append(f'Ignoring spurious close parenthesis at position {current_index}')
+            elif char.isalpha():
+                while index <= max_index and s[index].isalpha():
+                    index += 1
+                # interned, as DAIDE tokens are compared and used as dictionary keys many times
+                tree.append(sys.intern(s[current_index:index]))
             else:
-                errors.append(f'Missing close parenthesis')
-                return tree, errors, index
+                errors.append(f'Ignoring spurious character {char} at position {current_index}')
+        n_missing_close_parentheses = len(stack) + (1 if rec_level else 0)
+        errors.extend(['Missing close parenthesis'] * n_missing_close_parentheses)
+        return (stack[0] if stack else tree), errors, index
 
     def print_daide_tree(self, tree: Union[list, str], rec_level: int = 0) -> str:
-        result = ''
         if isinstance(tree, list):
-            if rec_level:
-                result += '('
-            result += ' '.join([self.print_daide_tree(tree[x], rec_level+1) for x in list(range(len(tree)))])
-            if rec_level:
-                result += ')'
+            result = ' '.join([self.print_daide_tree(sub_tree, rec_level+1) for sub_tree in tree])
+            return f'({result})' if rec_level else result
         else:
-            result += tree
-        return result
+            return tree
 
     def ann(self, s: str, synt: str = None, sem: str = None) -> str:
         """Annotate (result) string"""
@@ -149,129 +194,133 @@ class Daide:
         return s
 
     def daide_to_english(self, tree: Union[list, str], form: Optional[str] = None, rec_level: int = 0) -> str:
+        # cached for top-level trees, as the same DAIDE expressions recur across messages;
+        # the synt/sem annotations of the English were recorded when it was first generated
+        if rec_level or not isinstance(tree, list):
+            return self.uncached_daide_to_english(tree, form, rec_level)
+        key = (freeze_daide_tree(tree), form)
+        if (english := self._english_cache.get(key)) is None:
+            english = self.uncached_daide_to_english(tree, form, rec_level)
+            if len(self._english_cache) >= self.max_english_cache_size:
+                del self._english_cache[next(iter(self._english_cache))]  # oldest entry
+            self._english_cache[key] = english
+        return english
+
+    def uncached_daide_to_english(self, tree: Union[list, str], form: Optional[str], rec_level: int) -> str:
         if isinstance(tree, list):
             if form == 'N LIST':
-                result = ''
-                n = len(tree)
-                for i in range(n):
-                    result += self.daide_to_english(tree[i], 'N', rec_level+1)
-                    if i < n-2:
-                        result += ', '
-                    elif i == n-2:
-                        result += ' and '
-                return result
-            # move order
-            elif len(tree) == 3 \
-                    and isinstance(tree[1], str) \
-                    and tree[1] == 'MTO':
-                unit_name = self.daide_to_english(tree[0], '', rec_level+1)
-                destination_name = self.daide_to_english(tree[2], '', rec_level+1)
-                if form and re.match(r'.*\border\b', form):
-                    return self.ann(f"{unit_name} shall move to {destination_name}", synt='snt')
-                else:
-                    return self.ann(f"{unit_name} moved to {destination_name}", synt='snt')
-            # hold order
-            elif len(tree) == 2 \
-                    and isinstance(tree[1], str) \
-                    and tree[1] == 'HLD':
-                unit_name = self.daide_to_english(tree[0], '', rec_level+1)
-                if re.match(r'.*\border\b', form):
-                    return self.ann(f"{unit_name} shall remain in place", synt='snt')
-                else:
-                    return self.ann(f"{unit_name} remained in place", synt='snt')
-            # support order
-            elif len(tree) in (3, 5) \
-                    and isinstance(tree[1], str) \
-                    and tree[1] == 'SUP':
-                unit1_name = self.daide_to_english(tree[0], '', rec_level+1)
-                unit2_name = self.daide_to_english(tree[2], '', rec_level+1)
-                support_object = unit2_name
-                if len(tree) == 5 and isinstance(tree[3], str):
-                    if tree[3] == 'MTO':
-                        destination_name = self.daide_to_english(tree[4], '', rec_level+1)
-                        support_object = f"{unit2_name} moving to {destination_name}"
-                    else:
-                        support_object = f"{unit2_name} " \
-                                         f"{self.daide_to_english(tree[3], '', rec_level+1)} " \
-                                         f"{self.daide_to_english(tree[4], '', rec_level+1)}"
-                if re.match(r'.*\border\b', form):
-                    return self.ann(f"{unit1_name} shall support {support_object}", synt='snt')
-                else:
-                    return self.ann(f"{unit1_name} supported {support_object}", synt='snt')
-            elif isinstance(tree[0], str):
-                if len(tree) == 1 \
-                        and (name := (self.power_name.get(tree[0], None)
-                                   or self.province_name.get(tree[0], None)
-                                   or self.sea_name.get(tree[0], None))):
+                names = [self.daide_to_english(sub_tree, 'N', rec_level+1) for sub_tree in tree]
+                if len(names) >= 2:
+                    return ', '.join(names[:-1]) + ' and ' + names[-1]
+                return ''.join(names)
+            n = len(tree)
+            op1 = tree[1] if n >= 2 and isinstance(tree[1], str) else None
+            # orders such as (unit) MTO (location)
+            if op1 is not None \
+                    and (english_handler := self.english_handler_by_op1.get(op1)) \
+                    and (english := english_handler(self, tree, form, rec_level)) is not None:
+                return english
+            elif isinstance(op0 := tree[0], str):
+                if n == 1 \
+                        and (name := self._power_or_location_name.get(op0)):
                     return name
                 # the English fleet in Liverpool
-                elif len(tree) == 3 \
-                        and isinstance(tree[0], str) \
-                        and isinstance(tree[1], str) \
-                        and (power_name := self.power_name.get(tree[0], None)) \
-                        and (unit_type_name := self.unit_type_name.get(tree[1], None)) \
+                elif n == 3 \
+                        and op1 is not None \
+                        and (power_name := self.power_name.get(op0, None)) \
+                        and (unit_type_name := self.unit_type_name.get(op1, None)) \
                         and (location_name := self.daide_to_english(tree[2], '', rec_level+1)):
                     power_pertainym = self.pertainym.get(power_name, power_name)
                     location_prep = 'on' if self.sem_annotation.get(location_name,'') == 'coast' else 'in'
                     return f"the {power_pertainym} {unit_type_name} {location_prep} {location_name}"
                 # the south coast of Spain
-                elif len(tree) == 2 \
-                        and isinstance(tree[0], str) \
-                        and isinstance(tree[1], str) \
-                        and (location_name := self.province_name.get(tree[0], None)) \
-                        and (coast_name := self.coast_name.get(tree[1], None)):
+                elif n == 2 \
+                        and op1 is not None \
+                        and (location_name := self.province_name.get(op0, None)) \
+                        and (coast_name := self.coast_name.get(op1, None)):
                     location_def_article_clause = "the " if self.name_uses_def_article.get(location_name, None) else ""
                     return self.ann(f"the {coast_name} of {location_def_article_clause}{location_name}", sem="coast")
-                # submit order
-                elif tree[0] == 'SUB' and len(tree) >= 2:
-                    if len(tree) == 2:
-                        return self.ann("we submit the following order: "
-                                        + self.daide_to_english(tree[1], 'order', rec_level+1), synt='snt')
-                    else:
-                        result = "we submit the following orders:"
-                        n = len(tree)
-                        for i in range(1, len(tree)):
-                            result += f" ({i}) {self.daide_to_english(tree[i], 'order', rec_level+1)}"
-                            if i < n-2:
-                                result += ";"
-                            elif i < n-1:
-                                result += "; and"
-                        return self.ann(result, synt='snt')
-                # proposal
-                elif tree[0] == 'PRP' and len(tree) >= 2:
-                    return self.ann('we propose ' + self.daide_to_english(tree[1], 'COMPL', rec_level+1), synt='snt')
-                # alliance
-                elif tree[0] == 'ALY':
-                    allies = self.daide_to_english(tree[1], 'N LIST', rec_level+1) if len(tree) >= 2 else None
-                    enemies = self.daide_to_english(tree[2], 'N LIST', rec_level+1) if len(tree) >= 3 else None
-                    enemy_clause = f' against {enemies}' if enemies else ''
-                    if allies:
-                        if form in ('COMPL', 'N'):
-                            return f'an alliance between {allies}{enemy_clause}'
-                        else:
-                            return self.ann(f'{allies} are allies{enemy_clause}', synt='snt')
-                    else:
-                        return "an alliance"
-            result = ''
-            if rec_level:
-                result += '('
-            n = len(tree)
-            for i in range(n):
-                result += self.daide_to_english(tree[i], '', rec_level+1)
-                if i < n-1:
-                    result += ' '
-            if rec_level:
-                result += ')'
-            return result
+                # expressions such as SUB (order) ...
+                elif (english_handler := self.english_handler_by_op0.get(op0)) \
+                        and (english := english_handler(self, tree, form, rec_level)) is not None:
+                    return english
+            result = ' '.join([self.daide_to_english(sub_tree, '', rec_level+1) for sub_tree in tree])
+            return f'({result})' if rec_level else result
         elif isinstance(tree, str):
-            if location_name := self.province_name.get(tree, None) or self.sea_name.get(tree, None):
-                return f"the {location_name}" if self.name_uses_def_article.get(location_name) else location_name
-            if name := self.to_name.get(tree, ''):
-                return name
-            else:
-                return tree
+            return self._terminal_en.get(tree, tree)
         return '?E'
 
+    def move_to_english(self, tree: list, form: Optional[str], rec_level: int) -> Optional[str]:
+        if len(tree) == 3:
+            unit_name = self.daide_to_english(tree[0], '', rec_level+1)
+            destination_name = self.daide_to_english(tree[2], '', rec_level+1)
+            if form and _ORDER_RE.search(form):
+                return self.ann(f"{unit_name} shall move to {destination_name}", synt='snt')
+            else:
+                return self.ann(f"{unit_name} moved to {destination_name}", synt='snt')
+        return None
+
+    def hold_to_english(self, tree: list, form: Optional[str], rec_level: int) -> Optional[str]:
+        if len(tree) == 2:
+            unit_name = self.daide_to_english(tree[0], '', rec_level+1)
+            if form and _ORDER_RE.search(form):
+                return self.ann(f"{unit_name} shall remain in place", synt='snt')
+            else:
+                return self.ann(f"{unit_name} remained in place", synt='snt')
+        return None
+
+    def support_to_english(self, tree: list, form: Optional[str], rec_level: int) -> Optional[str]:
+        if len(tree) in (3, 5):
+            unit1_name = self.daide_to_english(tree[0], '', rec_level+1)
+            unit2_name = self.daide_to_english(tree[2], '', rec_level+1)
+            support_object = unit2_name
+            if len(tree) == 5 and isinstance(tree[3], str):
+                if tree[3] == 'MTO':
+                    destination_name = self.daide_to_english(tree[4], '', rec_level+1)
+                    support_object = f"{unit2_name} moving to {destination_name}"
+                else:
+                    support_object = f"{unit2_name} " \
+                                     f"{self.daide_to_english(tree[3], '', rec_level+1)} " \
+                                     f"{self.daide_to_english(tree[4], '', rec_level+1)}"
+            if form and _ORDER_RE.search(form):
+                return self.ann(f"{unit1_name} shall support {support_object}", synt='snt')
+            else:
+                return self.ann(f"{unit1_name} supported {support_object}", synt='snt')
+        return None
+
+    def submit_to_english(self, tree: list, form: Optional[str], rec_level: int) -> Optional[str]:
+        if len(tree) == 2:
+            return self.ann("we submit the following order: "
+                            + self.daide_to_english(tree[1], 'order', rec_level+1), synt='snt')
+        elif len(tree) > 2:
+            orders = [f" ({i}) {self.daide_to_english(tree[i], 'order', rec_level+1)}"
+                      for i in range(1, len(tree))]
+            return self.ann("we submit the following orders:" + ";".join(orders[:-1])
+                            + "; and" + orders[-1], synt='snt')
+        return None
+
+    def propose_to_english(self, tree: list, form: Optional[str], rec_level: int) -> Optional[str]:
+        if len(tree) >= 2:
+            return self.ann('we propose ' + self.daide_to_english(tree[1], 'COMPL', rec_level+1), synt='snt')
+        return None
+
+    def alliance_to_english(self, tree: list, form: Optional[str], rec_level: int) -> Optional[str]:
+        allies = self.daide_to_english(tree[1], 'N LIST', rec_level+1) if len(tree) >= 2 else None
+        enemies = self.daide_to_english(tree[2], 'N LIST', rec_level+1) if len(tree) >= 3 else None
+        enemy_clause = f' against {enemies}' if enemies else ''
+        if allies:
+            if form in ('COMPL', 'N'):
+                return f'an alliance between {allies}{enemy_clause}'
+            else:
+                return self.ann(f'{allies} are allies{enemy_clause}', synt='snt')
+        else:
+            return "an alliance"
+
+    # daide_to_english looks up handlers by the operator in second position, e.g. MTO in ((ENG FLT LON) MTO NTH),
+    # and then by the operator in first position, e.g. SUB in SUB ((ENG AMY LVP) HLD)
+    english_handler_by_op1 = {'MTO': move_to_english, 'HLD': hold_to_english, 'SUP': support_to_english}
+    english_handler_by_op0 = {'SUB': submit_to_english, 'PRP': propose_to_english, 'ALY': alliance_to_english}
+
 
 if __name__ == "__main__":
     resource_filename = os.path.join(data_dir_path, 'diplomacy-resources.txt')